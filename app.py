@@ -1,23 +1,41 @@
+import tempfile
+
 import streamlit as st
 
 from components.sidebar_milestone import render_milestone_controls
 from data_input import get_input_df
 from services.export_utils import png_to_pdf_bytes, generate_score_table, extract_diagnostic_info, detect_risks, \
     build_full_pdf
-from services.utils import clean_df, render_brand_logo
+from components.ui import render_brand_logo
 from constant import SCORING_RULES
-from services.scoring import compute_scores, build_customdata, build_hovertemplate
+from services.cache import RESULT_CACHE
+from services.render import render_png
+from services.bulk_reports import write_bulk_reports
+from services.pipeline import DASHBOARD
+from services.scoring_model import available_profiles, load_profile
 from components.dashboard_blocks import render_all_blocks
-from components.velocity_map import render_velocity_map
+from components.velocity_map import VELOCITY_GL_MIN_POINTS, show_velocity_figure
 from components.sidebar_controls import render_weights_and_thresholds
-from constant import TREND_COLORS, QUADRANT_CONFIG
+from components.sensitivity_panel import render_sensitivity_panel
+from constant import COMPANY_COL
 from services.utils import format_month_for_display
 
 
 render_brand_logo(where="sidebar", width=100)
 
-df = get_input_df()
-df = clean_df(df)
+# Each stage is recomputed only when one of its inputs changed (see services/pipeline.py)
+pipeline_memo = st.session_state.setdefault("_pipeline", {})
+pipeline_memo["__recomputed__"] = []
+params = {"raw": get_input_df()}
+param_keys = {"raw": st.session_state.get("active_key")}
+
+try:
+    df, clean_notices = DASHBOARD.run("cleaned", params, pipeline_memo, param_keys)
+except ValueError as e:
+    st.error(str(e))
+    st.stop()
+for notice in clean_notices:
+    st.info(notice)
 
 import pandas as pd
 
@@ -33,7 +51,7 @@ if month_num is None or not month_num.notna().any():
     st.session_state.pop("snap_range", None)
 
 else:
-    valid_months = month_num.dropna().astype(int).sort_values().tolist()
+    valid_months = month_num.dropna().astype(int).drop_duplicates().sort_values().tolist()
 
     if len(valid_months) == 1:
         month_val = valid_months[0]
@@ -72,11 +90,35 @@ else:
             st.session_state["snap_active"] = False
             st.session_state["snap_range"] = None
 
+params["snap_range"] = None
 if st.session_state.get("snap_active") and st.session_state.get("snap_range"):
     sm, em = st.session_state["snap_range"]
-    mask = pd.to_numeric(df["Month"], errors="coerce").between(sm, em, inclusive="both")
-    df = df.loc[mask].sort_values("Month").reset_index(drop=True)
+    params["snap_range"] = (sm, em)
     st.caption(f"Snapshot active: Month {sm} → {em}")
+df = DASHBOARD.run("frame", params, pipeline_memo, param_keys)
+
+company = None
+if COMPANY_COL in df.columns:
+    companies = df[COMPANY_COL].drop_duplicates().tolist()
+    st.sidebar.markdown("### Portfolio")
+    company = st.sidebar.selectbox("Company", companies, key="portfolio_company")
+    st.sidebar.caption(f"{len(companies)} companies in file; all are scored, one is shown.")
+    map_all = st.sidebar.checkbox("Velocity map: all companies", key="map_all_companies")
+else:
+    map_all = False
+
+map_range = None
+map_rows = len(df) if map_all or company is None else int((df[COMPANY_COL] == company).sum())
+if map_rows > VELOCITY_GL_MIN_POINTS and "Month" in df.columns:
+    map_months = sorted(int(m) for m in df["Month"].dropna().unique())
+    if len(map_months) > 1:
+        lo, hi = st.sidebar.select_slider(
+            "Velocity map range", options=map_months, value=(map_months[0], map_months[-1]),
+            format_func=format_month_for_display, key="map_range"
+        )
+        st.sidebar.caption("Large map: reduced to its shape-defining points. Narrow the range for full detail.")
+        if (lo, hi) != (map_months[0], map_months[-1]):
+            map_range = (lo, hi)
 
 
 bad_rows = df["__row_has_nan"].sum()
@@ -87,36 +129,56 @@ st.success(f"Loaded {len(df)} rows ")
 with st.expander("View Raw Data"):
     st.dataframe(df, use_container_width=True)
 
+profile = st.sidebar.selectbox("Rule Profile", available_profiles(), key="rule_profile")
+scoring_model = load_profile(profile)
+
 weights, norm_weights, age_threshold = render_weights_and_thresholds(SCORING_RULES, df)
 milestone_config = render_milestone_controls(df)
 score_threshold = 60
 
-if "_loaded_df" in st.session_state:
-    df_scored = st.session_state.pop("_loaded_df")
-else:
-    try:
-        df_scored = compute_scores(df, norm_weights, age_threshold, score_threshold, milestone_config)
-    except Exception as e:
-        st.error(f" Scoring failed: {e}")
-        st.stop()
-
-render_all_blocks(df)
-
-metric_cols = list(SCORING_RULES)
-customdata = build_customdata(df_scored, metric_cols)
-hover_tmpl = build_hovertemplate(metric_cols)
-velocity_fig = render_velocity_map(
-    df_scored, customdata, hover_tmpl, score_threshold,
-    QUADRANT_CONFIG, TREND_COLORS, milestone_config["enabled"], milestone_config["field"],
-    milestone_config["op"], milestone_config["threshold"], age_threshold
+st.sidebar.markdown("### Uncertainty")
+n_boot = None
+if st.sidebar.toggle("Show score confidence bands", key="ci_enabled"):
+    n_boot = int(st.sidebar.number_input("Bootstrap draws", min_value=100, max_value=2000, value=500, step=100))
+
+params.update(
+    company=company, map_all=map_all, map_range=map_range, norm_weights=norm_weights, model=scoring_model, age_threshold=age_threshold,
+    score_threshold=score_threshold, milestone_config=milestone_config, n_boot=n_boot
 )
+if "_loaded_df" in st.session_state:
+    params["scored"] = st.session_state.pop("_loaded_df")
+
+try:
+    results = DASHBOARD.run(["scored", "frame", "frame_view", "view", "velocity_fig"], params, pipeline_memo, param_keys)
+except Exception as e:
+    st.error(f" Scoring failed: {e}")
+    st.stop()
+
+df_portfolio_scored = results["scored"]
+df = results["frame_view"]
+df_scored = results["view"]
+
+with st.sidebar.expander("Result cache"):
+    cache_stats = RESULT_CACHE.stats()
+    st.caption(
+        f"{cache_stats['entries']} entries · {cache_stats['used_mb']:.1f} / {cache_stats['max_mb']:.0f} MB · "
+        f"{cache_stats['hits']} hits / {cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%}) · "
+        f"{cache_stats['evictions']} evicted"
+    )
+    st.caption("Recomputed this run: " + (", ".join(pipeline_memo["__recomputed__"]) or "nothing"))
+
+render_all_blocks(df, scoring_model.rules)
+
+velocity_fig = show_velocity_figure(results["velocity_fig"])
+
+render_sensitivity_panel(df_scored, norm_weights, score_threshold, scoring_model)
 
 #render_snapshot_controls(df_scored, weights, age_threshold)
 
 with st.expander(" Export Reports & Scored Data"):
     st.download_button(
         label="️ Download Scored Data (CSV)",
-        data=df_scored.to_csv(index=False).encode(),
+        data=df_portfolio_scored.to_csv(index=False).encode(),
         file_name="scored_data.csv",
         mime="text/csv"
     )
@@ -126,20 +188,22 @@ with st.expander(" Export Reports & Scored Data"):
     st.subheader(" Diagnostic Reports")
 
     full_mode = st.toggle(" Include Full Diagnosis (Score Table + Risk Analysis)", value=True)
+    compact_mode = st.toggle(" Compact PDF (smaller file, 150 DPI charts)", value=False)
 
     if st.button(" Generate PDF Report"):
-        png_bytes = velocity_fig.to_image(format="png")
+        png_bytes = render_png(velocity_fig)
 
         if full_mode:
             score_table = generate_score_table(df_scored, SCORING_RULES)
             quadrant, trend, composite_score = extract_diagnostic_info(df_scored)
             risks = detect_risks(df_scored)
 
-            pdf_bytes = build_full_pdf(png_bytes, score_table, quadrant, trend, composite_score, risks,df)
+            pdf_bytes = build_full_pdf(png_bytes, score_table, quadrant, trend, composite_score, risks, df, compact=compact_mode,
+                                       rules=scoring_model.rules)
 
             file_name = "scale_curves_diagnostic.pdf"
         else:
-            pdf_bytes = png_to_pdf_bytes(png_bytes, title="Scale_Curves Report")
+            pdf_bytes = png_to_pdf_bytes(png_bytes, title="Scale_Curves Report", compact=compact_mode)
             file_name = "Scale_Curves_Report.pdf"
 
         st.download_button(
@@ -147,4 +211,24 @@ with st.expander(" Export Reports & Scored Data"):
             data=pdf_bytes,
             file_name=file_name,
             mime="application/pdf"
+        )
+
+    if COMPANY_COL in df_portfolio_scored.columns and st.button(" Generate PDF Reports for All Companies (ZIP)"):
+        progress_bar = st.progress(0.0, text="Building reports...")
+        # Reports are written into the archive as they finish; the unnamed temp file is removed on close
+        with tempfile.TemporaryFile() as zip_file:
+            errors = write_bulk_reports(
+                zip_file, df_portfolio_scored, results["frame"], score_threshold, age_threshold, milestone_config,
+                compact=compact_mode, rules=scoring_model.rules,
+                progress=lambda done, total, name: progress_bar.progress(done / total, text=f"{done}/{total} · {name}")
+            )
+            zip_file.seek(0)
+            zip_bytes = zip_file.read()
+        if errors:
+            st.warning(f"{len(errors)} companies could not be reported; see errors.txt in the archive.")
+        st.download_button(
+            label="️ Download Reports (ZIP)",
+            data=zip_bytes,
+            file_name="portfolio_diagnostics.zip",
+            mime="application/zip"
         )
\ No newline at end of file
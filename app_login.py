@@ -6,7 +6,8 @@ from components.sidebar_controls import render_weights_and_thresholds
 from components.sidebar_milestone import render_milestone_controls
 from data_input import get_input_df
 from services.export_utils import png_to_pdf_bytes, generate_score_table, extract_diagnostic_info, detect_risks, build_full_pdf
-from services.utils import clean_df, render_brand_logo
+from components.ui import clean_df, render_brand_logo
+from services.render import render_png
 from constant import SCORING_RULES, TREND_COLORS, QUADRANT_CONFIG
 from services.scoring import compute_scores, build_customdata, build_hovertemplate
 from components.dashboard_blocks import render_all_blocks
@@ -137,20 +138,21 @@ with st.expander(" Export Reports & Scored Data"):
     st.subheader(" Diagnostic Reports")
 
     full_mode = st.toggle(" Include Full Diagnosis (Score Table + Risk Analysis)", value=True)
+    compact_mode = st.toggle(" Compact PDF (smaller file, 150 DPI charts)", value=False)
 
     if st.button(" Generate PDF Report"):
-        png_bytes = velocity_fig.to_image(format="png")
+        png_bytes = render_png(velocity_fig)
 
         if full_mode:
             score_table = generate_score_table(df_scored, SCORING_RULES)
             quadrant, trend, composite_score = extract_diagnostic_info(df_scored)
             risks = detect_risks(df_scored)
 
-            pdf_bytes = build_full_pdf(png_bytes, score_table, quadrant, trend, composite_score, risks,df)
+            pdf_bytes = build_full_pdf(png_bytes, score_table, quadrant, trend, composite_score, risks, df, compact=compact_mode)
 
             file_name = "velocity_map_diagnostic.pdf"
         else:
-            pdf_bytes = png_to_pdf_bytes(png_bytes, title="Velocity Map Report")
+            pdf_bytes = png_to_pdf_bytes(png_bytes, title="Velocity Map Report", compact=compact_mode)
             file_name = "velocity_map_simple.pdf"
 
         st.download_button(
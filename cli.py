@@ -0,0 +1,67 @@
+"""Score startup metric files without the dashboard, e.g. from cron:
+
+    python cli.py data/*.csv --config weights.yaml --out scored/ --pdf
+
+Each input (CSV, XLSX, Parquet or Arrow/Feather) is cleaned, scored and written to
+<out>/<name>_scored.<format>; several files are processed in parallel worker processes.
+"""
+import argparse
+import json
+import sys
+
+from services.batch import INPUT_FORMATS, OUTPUT_FORMATS, load_run_config, score_files
+
+
+def _month_range(text):
+    try:
+        start, end = (int(part) for part in text.split(":"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected YYYYMM:YYYYMM, e.g. 202301:202312")
+    return start, end
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Batch-score startup metric files.")
+    parser.add_argument("inputs", nargs="+", help=f"input files ({', '.join(INPUT_FORMATS)})")
+    parser.add_argument("--config", help="YAML with profile, weights, thresholds and milestone")
+    parser.add_argument("--out", default="scored", help="output directory (default: scored)")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="csv", help="scored output format")
+    parser.add_argument("--months", type=_month_range, help="only score months in YYYYMM:YYYYMM")
+    parser.add_argument("--pdf", action="store_true", help="also write diagnostic PDFs (a ZIP per portfolio)")
+    parser.add_argument("--compact", action="store_true", help="smaller PDFs with downsampled charts")
+    parser.add_argument("--workers", type=int, help="parallel files (default: one per CPU)")
+    parser.add_argument("--json", action="store_true", help="print one JSON summary per file")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        config = load_run_config(args.config)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    summaries = score_files(args.inputs, config, args.out, args.format, args.pdf, args.compact,
+                            args.months, args.workers)
+
+    failed = 0
+    for summary in summaries:
+        if args.json:
+            print(json.dumps({k: v for k, v in summary.items() if k != "traceback"}))
+        if "error" in summary:
+            failed += 1
+            print(f"{summary['input']}: FAILED {summary['error']}", file=sys.stderr)
+            continue
+        if not args.json:
+            print(f"{summary['input']}: {summary['rows']} rows, {summary['companies']} companies -> "
+                  f"{summary['output']}" + (f" (+ {summary['reports']})" if summary["reports"] else ""))
+        for warning in summary["warnings"]:
+            print(f"{summary['input']}: {warning}", file=sys.stderr)
+        for company, error in summary["report_errors"].items():
+            print(f"{summary['input']}: report for {company} failed: {error.splitlines()[0]}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
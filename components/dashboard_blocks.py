@@ -3,7 +3,9 @@ from constant import DASHBOARD_TITLES, SCORING_RULES, CHART_COLOR_SCHEMES
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
-import plotly.io as pio
+
+from services.cache import RESULT_CACHE, content_key, frame_digest
+from services.render import render_png, render_pngs
 
 
 def get_existing_columns(df, desired_cols):
@@ -13,8 +15,10 @@ def get_existing_columns(df, desired_cols):
     ]
 
 
-def diagnose(metric: str, value: float) -> str:
-    rule = SCORING_RULES.get(metric)
+def diagnose(metric: str, value: float, rules: dict = None) -> str:
+    """Warning for a metric's latest value; thresholds come from `rules` (the active ScoringModel's rules,
+    SCORING_RULES by default) and the suggested action from SCORING_RULES."""
+    rule = (rules or SCORING_RULES).get(metric)
     if not rule:
         return ""
 
@@ -31,100 +35,127 @@ def diagnose(metric: str, value: float) -> str:
             tip = f" {metric}: above ideal ({value})"
 
     if tip:
-        action = rule.get("action")
+        action = SCORING_RULES.get(metric, {}).get("action")
         return f"{tip}" + (f" →  {action}" if action else "")
     return ""
 
 
-def render_block(df, title, metric_list, chart_type="line", height=280):
-    with st.expander(title):
-        cols = get_existing_columns(df, metric_list)
-        if not cols:
-            st.warning(f"No available metrics for {title}.")
-            return
+BLOCK_CAPTIONS = {
+    "pie": (
+        "This pie shows how your total identified risk breaks down by category. "
+        "Each slice represents that category's share (%) of your overall risk profile (100%), "
+        "so you can see where you're most exposed and prioritize accordingly."
+    ),
+    "radar": (
+        "Each axis represents a core operational metric. "
+        "The shaded area shows your current performance across these metrics. "
+        "Bigger and more balanced means stronger operations overall."
+    ),
+}
 
-        x_axis_col = "Month_Display" if "Month_Display" in df.columns else "Month"
 
-        if chart_type == "bar":
-            fig = px.bar(
-                df,
-                x=x_axis_col,
-                y=cols,
-                barmode="group",
-                height=height,
-                color_discrete_sequence=CHART_COLOR_SCHEMES["bar"],
-            )
-            if "Month_Index" in df.columns:
-                fig.update_xaxes(categoryorder="array", categoryarray=df["Month_Display"].tolist())
-
-        elif chart_type == "pie":
-            latest = df.iloc[-1]
-            raw_values = [latest.get(c, 0) for c in cols]
-            total = sum(raw_values)
-            values = [v / total for v in raw_values] if total > 0 else [0 for _ in raw_values]
-
-            fig = px.pie(
-                names=cols,
-                values=values,
-                height=height,
-                color_discrete_sequence=CHART_COLOR_SCHEMES["pie"],
-            )
-            fig.update_traces(textinfo="percent+label", hovertemplate="%{label}: %{percent} ")
-            st.caption(
-                "This pie shows how your total identified risk breaks down by category. "
-                "Each slice represents that category's share (%) of your overall risk profile (100%), "
-                "so you can see where you're most exposed and prioritize accordingly."
-            )
+def build_block_figure(df, cols, chart_type="line", height=280):
+    x_axis_col = "Month_Display" if "Month_Display" in df.columns else "Month"
 
-        elif chart_type == "radar":
-            latest = df.iloc[-1]
-            values = [latest.get(c, 0) for c in cols]
-            labels = [c.replace("_%", "").replace("_hrs", " hrs").replace("_", " ") for c in cols]
-
-            fig = go.Figure()
-            fig.add_trace(go.Scatterpolar(
-                r=values,
-                theta=labels,
-                fill='toself',
-                name="Current",
-                line=dict(color=CHART_COLOR_SCHEMES["radar"]),
-                fillcolor="rgba(65,105,225,0.5)",
-            ))
-            fig.update_layout(
-                polar=dict(radialaxis=dict(visible=True, range=[0, 100])),
-                showlegend=False,
-                height=height,
-            )
-            st.caption(
-                "Each axis represents a core operational metric. "
-                "The shaded area shows your current performance across these metrics. "
-                "Bigger and more balanced means stronger operations overall."
-            )
+    if chart_type == "bar":
+        fig = px.bar(
+            df,
+            x=x_axis_col,
+            y=cols,
+            barmode="group",
+            height=height,
+            color_discrete_sequence=CHART_COLOR_SCHEMES["bar"],
+        )
+        if "Month_Index" in df.columns:
+            fig.update_xaxes(categoryorder="array", categoryarray=df["Month_Display"].tolist())
 
-        else:  # line chart
-            fig = px.line(
-                df,
-                x=x_axis_col,
-                y=cols,
-                markers=True,
-                height=height,
-                color_discrete_sequence=CHART_COLOR_SCHEMES["line"],
-            )
-            if "Month_Index" in df.columns:
-                fig.update_xaxes(categoryorder="array", categoryarray=df["Month_Display"].tolist())
-            else:
-                fig.update_xaxes(type="category")
+    elif chart_type == "pie":
+        latest = df.iloc[-1]
+        raw_values = [latest.get(c, 0) for c in cols]
+        total = sum(raw_values)
+        values = [v / total for v in raw_values] if total > 0 else [0 for _ in raw_values]
+
+        fig = px.pie(
+            names=cols,
+            values=values,
+            height=height,
+            color_discrete_sequence=CHART_COLOR_SCHEMES["pie"],
+        )
+        fig.update_traces(textinfo="percent+label", hovertemplate="%{label}: %{percent} ")
+
+    elif chart_type == "radar":
+        latest = df.iloc[-1]
+        values = [latest.get(c, 0) for c in cols]
+        labels = [c.replace("_%", "").replace("_hrs", " hrs").replace("_", " ") for c in cols]
+
+        fig = go.Figure()
+        fig.add_trace(go.Scatterpolar(
+            r=values,
+            theta=labels,
+            fill='toself',
+            name="Current",
+            line=dict(color=CHART_COLOR_SCHEMES["radar"]),
+            fillcolor="rgba(65,105,225,0.5)",
+        ))
+        fig.update_layout(
+            polar=dict(radialaxis=dict(visible=True, range=[0, 100])),
+            showlegend=False,
+            height=height,
+        )
+
+    else:  # line chart
+        fig = px.line(
+            df,
+            x=x_axis_col,
+            y=cols,
+            markers=True,
+            height=height,
+            color_discrete_sequence=CHART_COLOR_SCHEMES["line"],
+        )
+        if "Month_Index" in df.columns:
+            fig.update_xaxes(categoryorder="array", categoryarray=df["Month_Display"].tolist())
+        else:
+            fig.update_xaxes(type="category")
 
-        if chart_type not in ["pie", "radar"]:
-            fig.update_traces(hovertemplate='%{y} (%{x})')
+    if chart_type not in ["pie", "radar"]:
+        fig.update_traces(hovertemplate='%{y} (%{x})')
 
-        st.plotly_chart(fig, use_container_width=True)
+    return fig
 
-        latest_dict = df.iloc[-1].to_dict()
-        for c in cols:
-            diag = diagnose(c, latest_dict[c])
-            if diag:
-                st.warning(diag)
+
+def render_block(df, title, metric_list, chart_type="line", height=280, data_key=None, rules=None):
+    _render_block_body(df, title, metric_list, chart_type, height, data_key or frame_digest(df), rules)
+
+
+@st.fragment
+def _render_block_body(df, title, metric_list, chart_type, height, data_key, rules):
+    # Runs as a fragment: opening or closing one block reruns only this block, not the page or the scoring
+    block = st.expander(title, key=f"block_open_{title}", on_change="rerun")
+    with block:
+        if block.open:
+            _render_block_chart(df, title, metric_list, chart_type, height, data_key, rules)
+
+
+def _render_block_chart(df, title, metric_list, chart_type, height, data_key, rules):
+    cols = get_existing_columns(df, metric_list)
+    if not cols:
+        st.warning(f"No available metrics for {title}.")
+        return
+
+    # Shared by every session showing the same data; plotly_chart only reads it
+    fig = RESULT_CACHE.get_or_compute(
+        content_key("block_figure", data_key, chart_type, cols, height),
+        lambda: build_block_figure(df, cols, chart_type, height)
+    )
+    if chart_type in BLOCK_CAPTIONS:
+        st.caption(BLOCK_CAPTIONS[chart_type])
+    st.plotly_chart(fig, use_container_width=True)
+
+    latest_dict = df.iloc[-1].to_dict()
+    for c in cols:
+        diag = diagnose(c, latest_dict[c], rules)
+        if diag:
+            st.warning(diag)
 
 
 DEFAULT_CHART_TYPES = {
@@ -137,7 +168,9 @@ DEFAULT_CHART_TYPES = {
 }
 
 
-def render_all_blocks(df):
+def render_all_blocks(df, rules=None):
+    # Hashed once for all six blocks' figure cache keys
+    data_key = frame_digest(df)
     modules = list(ALL_METRIC_CLUSTERS.keys())
     for i in range(0, len(modules), 2):
         col1, col2 = st.columns(2)
@@ -148,7 +181,9 @@ def render_all_blocks(df):
                 df,
                 DASHBOARD_TITLES[m1],
                 ALL_METRIC_CLUSTERS[m1],
-                chart_type=DEFAULT_CHART_TYPES.get(m1, "line")
+                chart_type=DEFAULT_CHART_TYPES.get(m1, "line"),
+                data_key=data_key,
+                rules=rules
             )
         if i + 1 < len(modules):
             with col2:
@@ -158,14 +193,17 @@ def render_all_blocks(df):
                     df,
                     DASHBOARD_TITLES[m2],
                     ALL_METRIC_CLUSTERS[m2],
-                    chart_type=DEFAULT_CHART_TYPES.get(m2, "line")
+                    chart_type=DEFAULT_CHART_TYPES.get(m2, "line"),
+                    data_key=data_key,
+                    rules=rules
                 )
 
 
-def render_block_for_pdf(df, title, metric_list, chart_type="line", height=280):
+def build_pdf_block_figure(df, metric_list, chart_type="line", height=280):
+    """Figure of one metric cluster for the PDF report, and the metric columns it shows; None without metrics."""
     cols = get_existing_columns(df, metric_list)
     if not cols:
-        return title, None, ["No available metrics for this module."]
+        return None, cols
 
     x_axis_col = "Month_Display" if "Month_Display" in df.columns else "Month"
 
@@ -238,9 +276,28 @@ def render_block_for_pdf(df, title, metric_list, chart_type="line", height=280):
     if chart_type not in ["pie", "radar"]:
         fig.update_traces(hovertemplate='%{y} (%{x})')
 
-    png_bytes = pio.to_image(fig, format="png", scale=2)
+    return fig, cols
+
 
+def _pdf_block_diags(df, cols, rules=None):
+    if not cols:
+        return ["No available metrics for this module."]
     latest_dict = df.iloc[-1].to_dict()
-    diags = [diagnose(c, latest_dict[c]) for c in cols if diagnose(c, latest_dict[c])]
+    return [diag for diag in (diagnose(c, latest_dict[c], rules) for c in cols) if diag]
+
+
+def render_block_for_pdf(df, title, metric_list, chart_type="line", height=280, rules=None):
+    fig, cols = build_pdf_block_figure(df, metric_list, chart_type, height)
+    png_bytes = render_png(fig, scale=2) if fig is not None else None
+    return title, png_bytes, _pdf_block_diags(df, cols, rules)
+
+
+def render_blocks_for_pdf(df, height=280, rules=None):
+    """(title, png_bytes, diags) for every metric cluster; the charts are rendered as one batch."""
+    blocks = []
+    for module, metrics in ALL_METRIC_CLUSTERS.items():
+        fig, cols = build_pdf_block_figure(df, metrics, DEFAULT_CHART_TYPES.get(module, "line"), height)
+        blocks.append((DASHBOARD_TITLES[module], fig, _pdf_block_diags(df, cols, rules)))
 
-    return title, png_bytes, diags
\ No newline at end of file
+    pngs = iter(render_pngs([fig for _, fig, _ in blocks if fig is not None], scale=2))
+    return [(title, next(pngs) if fig is not None else None, diags) for title, fig, diags in blocks]
\ No newline at end of file
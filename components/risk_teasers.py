@@ -3,11 +3,12 @@ import streamlit as st
 import plotly.express as px
 from constant import EXPLANATION_TEMPLATES
 
-def get_teasers(latest_row: dict) -> list:
-    """Return list of teaser strings for critically abnormal metrics."""
+def get_teasers(latest_row: dict, rules: dict = None) -> list:
+    """Return list of teaser strings for critically abnormal metrics, judged by `rules` (SCORING_RULES by default)."""
+    rules = rules or SCORING_RULES
     teasers = []
     for metric, value in latest_row.items():
-        rule = SCORING_RULES.get(metric)
+        rule = rules.get(metric)
         if not rule:
             continue
         if rule["hib"]:
@@ -0,0 +1,84 @@
+# components/sensitivity_panel.py
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+from constant import WEIGHT_PRESETS
+from services.scoring import scoring_fingerprint
+from services.sensitivity import dirichlet_weights, preset_weights, simplex_grid, weight_sweep
+
+
+def render_sensitivity_panel(df_scored, norm_weights, score_threshold, model=None):
+    with st.expander(" Weight Sensitivity"):
+        metrics = list(norm_weights)
+        base = np.array([norm_weights[m] for m in metrics], dtype=float)
+
+        source = st.radio(
+            "Weight vectors",
+            options=["random", "grid", "presets"],
+            format_func=lambda x: {
+                "random": "Random around current weights",
+                "grid": "Grid over all weightings",
+                "presets": "Saved presets",
+            }[x],
+            horizontal=True,
+            key="sens_source"
+        )
+
+        if source == "random":
+            c1, c2 = st.columns(2)
+            n = c1.number_input("Samples", min_value=100, max_value=20000, value=1000, step=100, key="sens_n")
+            concentration = c2.slider("Concentration (higher = closer to current)", 5, 500, 50, key="sens_conc")
+            weight_matrix = dirichlet_weights(len(metrics), int(n), base=base, concentration=concentration, seed=0)
+            run_key = (source, int(n), concentration)
+        elif source == "grid":
+            steps = st.slider("Grid resolution (weight step = 1/resolution)", 2, 6, 4, key="sens_steps")
+            weight_matrix = simplex_grid(len(metrics), steps)
+            run_key = (source, steps)
+        else:
+            weight_matrix = preset_weights(metrics, WEIGHT_PRESETS)
+            run_key = (source, tuple(WEIGHT_PRESETS))
+
+        st.caption(f"{len(weight_matrix):,} weight vectors × {len(df_scored):,} rows")
+
+        run_key += (scoring_fingerprint(norm_weights, None, score_threshold, None, model), len(df_scored))
+        if st.button("Run sensitivity analysis", key="sens_run"):
+            st.session_state["_sensitivity"] = (
+                run_key, weight_sweep(df_scored, weight_matrix, metrics, score_threshold, model)
+            )
+
+        cached = st.session_state.get("_sensitivity")
+        if not cached or cached[0] != run_key:
+            return
+        result = cached[1]
+
+        x = df_scored["Month_Index"] if "Month_Index" in df_scored.columns else df_scored["Month"]
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            x=pd.concat([x, x[::-1]]),
+            y=pd.concat([result["CompositeMax"], result["CompositeMin"][::-1]]),
+            fill="toself", fillcolor="rgba(31,119,180,0.15)", line=dict(width=0),
+            name="Min–max across vectors", hoverinfo="skip"
+        ))
+        fig.add_trace(go.Scatter(x=x, y=result["CompositeMean"], mode="lines", name="Mean composite",
+                                 line=dict(color="#1f77b4")))
+        fig.add_trace(go.Scatter(x=x, y=df_scored["CompositeScore"], mode="markers", name="Current weights",
+                                 marker=dict(color="black", size=6)))
+        fig.add_trace(go.Bar(x=x, y=result["QuadrantStability"] * 100, name="Quadrant stability (%)",
+                             yaxis="y2", marker_color="rgba(127,127,127,0.35)"))
+        fig.add_hline(y=score_threshold, line=dict(color="black", width=1, dash="dot"))
+        fig.update_layout(
+            template="simple_white", height=360,
+            yaxis=dict(title="Composite Score"),
+            yaxis2=dict(title="Stability %", overlaying="y", side="right", range=[0, 100], showgrid=False),
+            margin=dict(l=40, r=40, t=30, b=40),
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+        table = result.copy()
+        if "Month_Display" in df_scored.columns:
+            table.insert(0, "Month", df_scored["Month_Display"])
+        table.insert(1, "Quadrant", df_scored["Quadrant"])
+        st.dataframe(table.round(3), use_container_width=True)
@@ -3,6 +3,9 @@
 import streamlit as st
 import pandas as pd
 
+from constant import COMPANY_COL
+from services.scoring import normalize_weights
+
 def render_weights_and_thresholds(scoring_rules,df):
     # Snapshot override
     if "_pending_snapshot" in st.session_state:
@@ -19,8 +22,7 @@ def render_weights_and_thresholds(scoring_rules,df):
         for m in scoring_rules
     }
 
-    total = sum(weights.values()) or 1
-    norm_weights = {k: v / total for k, v in weights.items()}
+    norm_weights = normalize_weights(weights)
 
     MAX_WARN = 0.8
     over = [k for k, v in norm_weights.items() if v > MAX_WARN]
@@ -40,8 +42,10 @@ def render_weights_and_thresholds(scoring_rules,df):
     st.sidebar.dataframe(norm_df, height=200)
 
     if df is not None and "Month_Index" in df.columns:
-        smart_default = max(3, min(24, len(df) // 3))
-        max_val = len(df)
+        # Portfolio frames: size the threshold by the longest single-company history
+        n_months = int(df.groupby(COMPANY_COL).size().max()) if COMPANY_COL in df.columns else len(df)
+        smart_default = max(3, min(24, n_months // 3))
+        max_val = n_months
     else:
         smart_default = 15
         max_val = 48
@@ -2,6 +2,8 @@ import streamlit as st
 
 from constant import SCORING_RULES
 
+MAX_MILESTONE_CONDITIONS = 4
+
 
 def render_milestone_controls(df):
     st.sidebar.markdown("###  Milestone Logic")
@@ -18,21 +20,45 @@ def render_milestone_controls(df):
     numeric_cols = df.select_dtypes(include="number").columns.tolist()
 
     filtered_cols = [col for col in SCORING_RULES.keys() if col in numeric_cols]
-    field = st.sidebar.selectbox("Milestone Field", filtered_cols)
-    op = st.sidebar.radio(
-        "Operator",
-        options=[">=", "<="],
-        index=0,
-        format_func=lambda x: {"<=": "≤", ">=": "≥"}[x],
-        horizontal=True
+    n_conditions = st.sidebar.number_input(
+        "Conditions", min_value=1, max_value=MAX_MILESTONE_CONDITIONS, value=1, step=1, key="ms_n"
     )
 
-    threshold = st.sidebar.number_input("Milestone Threshold", value=50.0)
+    conditions = []
+    for i in range(int(n_conditions)):
+        suffix = "" if i == 0 else f" #{i + 1}"
+        field = st.sidebar.selectbox(f"Milestone Field{suffix}", filtered_cols, key=f"ms_field_{i}")
+        op = st.sidebar.radio(
+            f"Operator{suffix}",
+            options=[">=", "<="],
+            index=0,
+            format_func=lambda x: {"<=": "≤", ">=": "≥"}[x],
+            horizontal=True,
+            key=f"ms_op_{i}"
+        )
+        threshold = st.sidebar.number_input(f"Milestone Threshold{suffix}", value=50.0, key=f"ms_threshold_{i}")
+        conditions.append({"field": field, "op": op, "threshold": threshold})
+
+    logic = "and"
+    if len(conditions) > 1:
+        logic = st.sidebar.radio(
+            "Combine conditions",
+            options=["and", "or"],
+            format_func=lambda x: {"and": "All (AND)", "or": "Any (OR)"}[x],
+            horizontal=True,
+            key="ms_logic"
+        )
+
+    sustain = st.sidebar.number_input(
+        "Sustained for (consecutive months)", min_value=1, max_value=24, value=1, step=1, key="ms_sustain"
+    )
 
     return {
         "enabled": True,
-        "field": field,
-        "op": op,
-        "threshold": threshold
+        "field": conditions[0]["field"],
+        "op": conditions[0]["op"],
+        "threshold": conditions[0]["threshold"],
+        "conditions": conditions,
+        "logic": logic,
+        "sustain": int(sustain)
     }
-
@@ -0,0 +1,45 @@
+# components/ui.py
+
+import base64
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+from services.utils import clean_frame
+
+
+def clean_df(df_raw: pd.DataFrame) -> pd.DataFrame:
+    try:
+        df, notices = clean_frame(df_raw)
+    except ValueError as e:
+        st.error(str(e))
+        st.stop()
+
+    for notice in notices:
+        st.info(notice)
+    return df
+
+
+def get_img_as_base64(file_path):
+    return base64.b64encode(Path(file_path).read_bytes()).decode()
+
+
+def render_brand_logo(where="sidebar", width=200):
+    logo_path = "resources/logo.png"
+
+    target = st.sidebar if where == "sidebar" else st
+
+    target.image(logo_path, width=width)
+
+
+
+def render_logo_with_title(title):
+    logo_path = "resources/logo.png"
+    logo_base64 = get_img_as_base64(logo_path)
+    return f"""
+    <div style='display: flex; align-items: center; gap: 16px;'>
+        <img src='data:image/png;base64,{logo_base64}' style='width:80px; height:auto;'>
+        <h2 style='margin:0; font-size:2rem;'>{title}</h2>
+    </div>
+    """
@@ -1,38 +1,98 @@
 # components/velocity_map.py
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import streamlit as st
 
-from constant import TEXT_LABELS
-from services.utils import render_logo_with_title
+from components.ui import render_logo_with_title
+from constant import COMPANY_COL, QUADRANT_CONFIG, SCORING_RULES, TEXT_LABELS, TREND_COLORS
+from services.downsample import downsample_rows
+from services.evaluation import company_groups
+from services.milestones import describe_milestone
+from services.scoring import build_customdata, build_hovertemplate, hover_payload
+from services.trend import build_trend_segments
+
+# Above this many points the map switches to WebGL traces drawn from at most ~VELOCITY_MAX_POINTS rows
+VELOCITY_GL_MIN_POINTS = 5_000
+VELOCITY_MAX_POINTS = 20_000
+
 
 def render_velocity_map(df_scored, customdata, hover_tmpl, score_threshold,
                                    quadrant_config, trend_colors, use_milestone, milestone_field,
-                                   milestone_op, milestone_threshold, age_threshold):
+                                   milestone_op, milestone_threshold, age_threshold, milestone_label=None):
+    fig = build_velocity_figure(df_scored, customdata, hover_tmpl, score_threshold, quadrant_config, trend_colors,
+                                use_milestone, milestone_field, milestone_op, milestone_threshold, age_threshold,
+                                milestone_label)
+    return show_velocity_figure(fig)
+
 
+def show_velocity_figure(fig):
+    # `fig` may be memoized; the full-scale view is drawn on a copy
     st.markdown(render_logo_with_title(TEXT_LABELS["scale_curves_title"]), unsafe_allow_html=True)
 
+    zoom = st.checkbox("🔍 Zoom to data (un-check for full 0-100 scale)", value=True)
+    if not zoom:
+        fig = go.Figure(fig).update_yaxes(range=[0, 100])
+    st.plotly_chart(fig, use_container_width=fig.layout.width is None)
+
+    return fig
+
+
+def build_dashboard_velocity_figure(df_scored, score_threshold, age_threshold, milestone_config, customdata=None):
+    """build_velocity_figure() with the dashboard's quadrant/trend colours, hover template and milestone label."""
+    metric_cols = list(SCORING_RULES)
+    if customdata is None:
+        customdata = build_customdata(df_scored, metric_cols)
+    return build_velocity_figure(
+        df_scored, customdata, build_hovertemplate(metric_cols), score_threshold,
+        QUADRANT_CONFIG, TREND_COLORS, milestone_config["enabled"], milestone_config["field"],
+        milestone_config["op"], milestone_config["threshold"], age_threshold,
+        milestone_label=describe_milestone(milestone_config)
+    )
+
+
+def landmark_rows(df_scored, use_milestone=True):
+    """Rows a reduced map keeps first: each company's first row, quadrant changes and its milestone point
+    (downsample_rows() thins them too once they pass half of its budget).
+
+    Expects rows in (company, month) order, as clean_frame leaves them.
+    """
+    company = company_groups(df_scored).to_numpy()
+    quadrant = df_scored["Quadrant"].to_numpy()
+    keep = np.r_[True, (company[1:] != company[:-1]) | (quadrant[1:] != quadrant[:-1])]
+    if use_milestone and "_is_mature" in df_scored.columns:
+        mature = df_scored["_is_mature"].fillna(False).astype(bool)
+        first_mature = mature & ~mature.groupby(company, sort=False).shift(1, fill_value=False).astype(bool)
+        keep |= first_mature.to_numpy()
+    return keep
+
+
+def build_velocity_figure(df_scored, customdata, hover_tmpl, score_threshold, quadrant_config, trend_colors,
+                          use_milestone, milestone_field, milestone_op, milestone_threshold, age_threshold,
+                          milestone_label=None):
     y_min = min(40, df_scored["CompositeScore"].min())
     y_max = max(80, df_scored["CompositeScore"].max())
 
+    # Large maps are drawn with WebGL from an LTTB-reduced set of rows
+    large = len(df_scored) > VELOCITY_GL_MIN_POINTS
+    scatter = go.Scattergl if large else go.Scatter
+    if large:
+        x_col = "Month_Index" if "Month_Index" in df_scored.columns else "Month"
+        rows = downsample_rows(df_scored, x_col, "CompositeScore", VELOCITY_MAX_POINTS,
+                               keep=landmark_rows(df_scored, use_milestone), group_col=COMPANY_COL)
+        df_scored = df_scored.iloc[rows].reset_index(drop=True)
+        customdata = customdata[rows]
+
     fig = go.Figure()
 
-    for quad, meta in quadrant_config.items():
-        sub = df_scored[df_scored["Quadrant"] == quad]
-        if len(sub) > 0:
-            x_values = sub["Month_Index"] if "Month_Index" in sub.columns else sub["Month"]
+    if {"CompositeLow", "CompositeHigh"}.issubset(df_scored.columns):
+        fig = add_confidence_band(fig, df_scored)
+        y_min = min(y_min, df_scored["CompositeLow"].min())
+        y_max = max(y_max, df_scored["CompositeHigh"].max())
 
-            fig.add_trace(go.Scatter(
-                x=x_values,
-                y=sub["CompositeScore"],
-                mode="markers",
-                marker=dict(color=meta["color"], size=10),
-                name=meta["label"],
-                customdata=customdata[sub.index],
-                hovertemplate=hover_tmpl
-            ))
+    fig = add_quadrant_markers(fig, df_scored, customdata, hover_tmpl, quadrant_config, scatter)
 
-    fig = add_trend_lines_segment_by_segment(fig, df_scored, trend_colors)
+    fig = add_trend_lines_segment_by_segment(fig, df_scored, trend_colors, scatter)
 
     if use_milestone and "_is_mature" in df_scored.columns:
         mature_data = df_scored[df_scored["_is_mature"]]
@@ -51,7 +111,8 @@ def render_velocity_map(df_scored, customdata, hover_tmpl, score_threshold,
             fig.add_vline(
                 x=milestone_x,
                 line=dict(color="#6a0dad", width=3, dash="dot"),
-                annotation_text=f"{milestone_field} {'>=' if milestone_op == '>=' else '<='} {milestone_threshold:.2f}",
+                annotation_text=milestone_label or
+                                f"{milestone_field} {'>=' if milestone_op == '>=' else '<='} {milestone_threshold:.2f}",
                 annotation_position="top"
             )
     else:
@@ -87,7 +148,16 @@ def render_velocity_map(df_scored, customdata, hover_tmpl, score_threshold,
         annotation_position="right"
     )
 
-    if "Month_Display" in df_scored.columns and "Month_Index" in df_scored.columns:
+    several_companies = company_groups(df_scored).nunique() > 1
+    if several_companies and "Month_Index" in df_scored.columns:
+        # Month_Index counts months since each company's first record; calendar labels would not line up
+        x_axis_config = dict(
+            title="Months since first record",
+            showgrid=True,
+            gridcolor="rgba(0,0,0,0.15)"
+        )
+        bottom_margin = 40
+    elif "Month_Display" in df_scored.columns and "Month_Index" in df_scored.columns:
         month_labels = df_scored["Month_Display"].tolist()
         month_indices = df_scored["Month_Index"].tolist()
 
@@ -123,7 +193,8 @@ def render_velocity_map(df_scored, customdata, hover_tmpl, score_threshold,
 
     fig.update_layout(
         template="simple_white",
-        width=1600, height=480,
+        # Large maps follow the container width
+        width=None if large else 1600, height=480,
         xaxis=x_axis_config,
         yaxis=dict(
             title="Composite Score",
@@ -136,35 +207,78 @@ def render_velocity_map(df_scored, customdata, hover_tmpl, score_threshold,
         clickmode="event+select"
     )
 
-    zoom = st.checkbox("🔍 Zoom to data (un-check for full 0-100 scale)", value=True)
-    fig.update_yaxes(range=[y_min, y_max] if zoom else [0, 100])
-    st.plotly_chart(fig, use_container_width=False)
-
     return fig
 
 
-def add_trend_lines_segment_by_segment(fig, df_scored, trend_colors):
-    if "Month_Index" in df_scored.columns:
-        df_sorted = df_scored.sort_values("Month_Index").reset_index(drop=True)
-        x_col = "Month_Index"
-    else:
-        df_sorted = df_scored.sort_values("Month").reset_index(drop=True)
-        x_col = "Month"
+def add_quadrant_markers(fig, df_scored, customdata, hover_tmpl, quadrant_config, scatter=go.Scatter):
+    """All points in one marker trace coloured by quadrant code; the quadrant legend uses empty traces
+    in the marker trace's legend group, so clicking an entry toggles the markers."""
+    quads = list(quadrant_config)
+    codes = pd.Categorical(df_scored["Quadrant"], categories=quads).codes
+    on_map = codes >= 0
+    if not on_map.any():
+        return fig
 
-    trend_data = {trend: {"x": [], "y": []} for trend in ["up", "flat", "down"]}
+    sub = df_scored[on_map]
+    x_values = sub["Month_Index"] if "Month_Index" in sub.columns else sub["Month"]
+    hover_data, hover_tmpl = hover_payload(customdata[on_map], hover_tmpl)
+    # Stepped colorscale: code i falls in the i-th band and takes that quadrant's colour
+    colorscale = [[(i + edge) / len(quads), quadrant_config[q]["color"]] for i, q in enumerate(quads) for edge in (0, 1)]
+    fig.add_trace(scatter(
+        x=x_values,
+        y=sub["CompositeScore"],
+        mode="markers",
+        marker=dict(color=codes[on_map], colorscale=colorscale, cmin=-0.5, cmax=len(quads) - 0.5, size=10),
+        customdata=hover_data,
+        text=sub["Quadrant"],
+        hovertext=sub["LaggingMetric"].fillna(""),
+        hovertemplate=hover_tmpl,
+        name="Quadrant",
+        legendgroup="quadrants",
+        showlegend=False
+    ))
 
-    for i in range(len(df_sorted) - 1):
-        current = df_sorted.iloc[i]
-        next_point = df_sorted.iloc[i + 1]
+    for i, quad in enumerate(quads):
+        if (codes == i).any():
+            fig.add_trace(go.Scatter(
+                x=[None],
+                y=[None],
+                mode="markers",
+                marker=dict(color=quadrant_config[quad]["color"], size=10),
+                name=quadrant_config[quad]["label"],
+                legendgroup="quadrants",
+                hoverinfo="skip"
+            ))
+    return fig
 
-        trend = next_point["Trend"]
 
-        trend_data[trend]["x"].extend([current[x_col], next_point[x_col], None])
-        trend_data[trend]["y"].extend([current["CompositeScore"], next_point["CompositeScore"], None])
+def add_confidence_band(fig, df_scored):
+    """One band polygon per company, all in one trace; None gaps keep fill="toself" from joining them."""
+    x_col = "Month_Index" if "Month_Index" in df_scored.columns else "Month"
+    band = df_scored.sort_values(x_col, kind="stable").dropna(subset=["CompositeLow", "CompositeHigh"])
+    if band.empty:
+        return fig
 
-    for trend, data in trend_data.items():
-        if data["x"]:
-            fig.add_trace(go.Scatter(
+    xs, ys = [], []
+    for _, rows in band.groupby(company_groups(band), sort=False):
+        xs += [*rows[x_col], *rows[x_col][::-1], None]
+        ys += [*rows["CompositeHigh"], *rows["CompositeLow"][::-1], None]
+    fig.add_trace(go.Scatter(
+        x=xs,
+        y=ys,
+        fill="toself",
+        fillcolor="rgba(31,119,180,0.12)",
+        line=dict(width=0),
+        hoverinfo="skip",
+        name="90% score band"
+    ))
+    return fig
+
+
+def add_trend_lines_segment_by_segment(fig, df_scored, trend_colors, scatter=go.Scatter):
+    for trend, data in build_trend_segments(df_scored).items():
+        if len(data["x"]):
+            fig.add_trace(scatter(
                 x=data["x"],
                 y=data["y"],
                 mode="lines",
@@ -177,4 +291,4 @@ def add_trend_lines_segment_by_segment(fig, df_scored, trend_colors):
                 connectgaps=False
             ))
 
-    return fig
\ No newline at end of file
+    return fig
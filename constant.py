@@ -1,4 +1,6 @@
 # constants.py
+import os
+
 APP_NAME = "Perpetual Velocity"
 
 QUADRANT_LABELS = {
@@ -67,6 +69,19 @@ TEXT_LABELS = {
     "y_axis_label": "Composite Score"
 }
 
+# Optional key column: frames that carry it are scored as a portfolio, one history per company
+COMPANY_COL = "CompanyId"
+
+# Memory budget of the process-wide parse/clean/score cache, shared by all sessions
+RESULT_CACHE_MAX_MB = int(os.environ.get("RESULT_CACHE_MAX_MB", 512))
+
+# On-disk cache of parsed PDF tables, shared across sessions and restarts
+PDF_CACHE_DIR = os.environ.get("PDF_CACHE_DIR", ".cache/pdf_tables")
+PDF_CACHE_MAX_MB = int(os.environ.get("PDF_CACHE_MAX_MB", 256))
+
+# Rendered chart PNGs, keyed by figure spec; shared by every report built in the process
+PNG_CACHE_MAX_MB = int(os.environ.get("PNG_CACHE_MAX_MB", 128))
+
 SCORING_RULES = {
     "RevenueGrowthRate_%": {"good": 30, "bad": -10, "hib": True},
     "MRR_kUSD": {"good": 500, "bad": 0, "hib": True},
@@ -79,6 +94,26 @@ SCORING_RULES = {
     "RegulatoryComplianceRisk_%": {"good": 0, "bad": 60, "hib": False},
 }
 
+# Saved raw weight vectors (slider scale, 0-100) for the weight sensitivity panel
+WEIGHT_PRESETS = {
+    "Balanced": {m: 10 for m in SCORING_RULES},
+    "Growth": {
+        "RevenueGrowthRate_%": 30, "MRR_kUSD": 25, "BurnRate_kUSD": 5, "GrossMargin_%": 5,
+        "CustomerRetentionRate_%": 10, "ChurnRate_%": 5, "OperationalEfficiency_%": 5,
+        "UserEngagement_%": 15, "RegulatoryComplianceRisk_%": 0,
+    },
+    "Efficiency": {
+        "RevenueGrowthRate_%": 5, "MRR_kUSD": 10, "BurnRate_kUSD": 25, "GrossMargin_%": 25,
+        "CustomerRetentionRate_%": 5, "ChurnRate_%": 5, "OperationalEfficiency_%": 20,
+        "UserEngagement_%": 0, "RegulatoryComplianceRisk_%": 5,
+    },
+    "Risk-averse": {
+        "RevenueGrowthRate_%": 5, "MRR_kUSD": 10, "BurnRate_kUSD": 15, "GrossMargin_%": 5,
+        "CustomerRetentionRate_%": 20, "ChurnRate_%": 20, "OperationalEfficiency_%": 0,
+        "UserEngagement_%": 0, "RegulatoryComplianceRisk_%": 25,
+    },
+}
+
 EXPLANATION_TEMPLATES = {
     "RevenueGrowthRate_%": {
         "happening": "Revenue growth has dropped significantly below healthy levels.",
@@ -1,10 +1,15 @@
 from typing import List, Dict, Any
 
-import pdfplumber
 import streamlit as st
 import pandas as pd
 
+from constant import COMPANY_COL
+from services.cache import RESULT_CACHE, content_key, frame_digest
+from services.ingest import COLUMNAR_FORMATS, STREAM_CSV_MIN_BYTES, read_columnar, stream_csv
+from services.pdf_cache import cached_page_tables
+from services.pdf_tables import merge_page_tables
 from services.synthetic import generate_synthetic_company_data
+from services.xlsx_tables import read_xlsx
 
 MANUAL_COLS: List[str] = [
     "Month",
@@ -27,10 +32,12 @@ def get_input_df() ->pd.DataFrame:
         st.session_state.manual_df = pd.DataFrame(columns=MANUAL_COLS)
     if "active_df" not in st.session_state:
         st.session_state.active_df = None
+        st.session_state.active_key = None
 
 
     st.sidebar.header("Data Input")
-    upload_file = st.sidebar.file_uploader("Upload CSV / XLSX / PDF", ["csv","xlsx", "PDF"], key="file_upload_main")
+    upload_file = st.sidebar.file_uploader("Upload CSV / XLSX / PDF / Parquet / Arrow",
+                                           ["csv","xlsx", "PDF", *COLUMNAR_FORMATS], key="file_upload_main")
     demo = st.sidebar.button("Generate Demo")
     st.sidebar.download_button(
         "Download empty template",
@@ -42,33 +49,53 @@ def get_input_df() ->pd.DataFrame:
 
     if demo:
         st.session_state.active_df = generate_synthetic_company_data(seed=42)
+        st.session_state.active_key = content_key("demo", 42)
         st.sidebar.success("Demo data generated!")
 
     if upload_file:
         filename = upload_file.name.lower()
-        if filename.endswith("csv"):
-            st.session_state.active_df = pd.read_csv(upload_file)
-        elif filename.endswith("xlsx"):
-            st.session_state.active_df = pd.read_excel(upload_file)
-        elif filename.endswith("pdf"):
-            df_pdf = parse_pdf_flexible(upload_file)
-            if df_pdf.empty:
-                st.warning(" No readable tables detected in the uploaded PDF.")
+        if filename.endswith(("csv", "xlsx", "pdf", *COLUMNAR_FORMATS)):
+            # Parsed frames are shared by every session that uploads the same bytes
+            upload_key = content_key("upload", filename.rsplit(".", 1)[-1], upload_file.getvalue())
+            try:
+                if filename.endswith("pdf") and st.sidebar.button("Re-parse PDF (ignore cache)"):
+                    st.session_state.active_df = _read_upload(upload_file, force=True)
+                    RESULT_CACHE.put(upload_key, st.session_state.active_df)
+                else:
+                    st.session_state.active_df = RESULT_CACHE.get_or_compute(
+                        upload_key, lambda: _read_upload(upload_file))
+            except ValueError as e:
+                # Large CSVs are cleaned while streaming, so missing columns or an empty file already fail here
+                st.error(f" Could not read {upload_file.name}: {e}")
                 st.stop()
-            else:
-                st.session_state.active_df = df_pdf
-                st.sidebar.success(f"Loaded PDF with {df_pdf.shape[0]} rows and {df_pdf.shape[1]} columns")
+            st.session_state.active_key = upload_key
+            if filename.endswith("pdf"):
+                df_pdf = st.session_state.active_df
+                # A re-parse can change the tables behind the same bytes, so key downstream stages on content
+                st.session_state.active_key = frame_digest(df_pdf)
+                if df_pdf.empty:
+                    st.warning(" No readable tables detected in the uploaded PDF.")
+                    st.stop()
+                else:
+                    st.sidebar.success(f"Loaded PDF with {df_pdf.shape[0]} rows and {df_pdf.shape[1]} columns")
 
         else:
-            st.warning("Unsupported file format. Please upload CSV, XLSX, or PDF.")
+            st.warning("Unsupported file format. Please upload CSV, XLSX, PDF, Parquet or Arrow/Feather.")
             st.stop()
 
         st.sidebar.success(f"Loaded {upload_file.name}")
+        if "clean_notices" in st.session_state.active_df.attrs:
+            st.sidebar.caption("Large file: streamed in chunks with only the Month, company and scoring columns.")
+        elif filename.endswith(tuple(COLUMNAR_FORMATS)):
+            st.sidebar.caption("Columnar file: only the Month, company and scoring columns were read.")
+        elif filename.endswith("xlsx") and COMPANY_COL in st.session_state.active_df.columns:
+            st.sidebar.caption(f"Workbook: {st.session_state.active_df[COMPANY_COL].nunique()} companies loaded.")
 
     if manual_on:
         _render_manual_form()
         if not st.session_state.manual_df.empty:
             st.session_state.active_df = st.session_state.manual_df.copy()
+            st.session_state.active_key = frame_digest(st.session_state.active_df)
 
     if st.session_state.active_df is not None:
         return st.session_state.active_df
@@ -77,6 +104,19 @@ def get_input_df() ->pd.DataFrame:
     st.stop()
 
 
+def _read_upload(upload_file, force: bool = False) -> pd.DataFrame:
+    filename = upload_file.name.lower()
+    if filename.endswith("csv"):
+        if upload_file.size >= STREAM_CSV_MIN_BYTES:
+            return stream_csv(upload_file)[0]
+        return pd.read_csv(upload_file)
+    if filename.endswith(tuple(COLUMNAR_FORMATS)):
+        return read_columnar(upload_file, filename.rsplit(".", 1)[-1])
+    if filename.endswith("xlsx"):
+        return read_xlsx(upload_file.getvalue())
+    return parse_pdf_flexible(upload_file, force=force)
+
+
 def _render_manual_form() -> None:
     with st.sidebar.expander("Add new row"):
         with st.form("manual_form", clear_on_submit=True):
@@ -113,6 +153,7 @@ def _render_manual_form() -> None:
         if st.sidebar.button("Clear all manual data"):
             st.session_state.manual_df = pd.DataFrame(columns=MANUAL_COLS)
             st.session_state.active_df = st.session_state.manual_df
+            st.session_state.active_key = None
             st.sidebar.warning("All manual data cleared.")
             st.rerun()
 
@@ -124,55 +165,16 @@ def _render_manual_form() -> None:
         )
 
 
-def parse_pdf_flexible(upload_file, validate: bool = True) -> pd.DataFrame:
-    if validate:
-        with pdfplumber.open(upload_file) as pdf:
-            has_table = any(page.extract_tables() for page in pdf.pages)
-            if not has_table:
-                st.error("No detectable tables found in the PDF. "
-                         "Please upload a PDF exported from Excel/Sheets with clear table borders.")
-                st.stop()
+def parse_pdf_flexible(upload_file, validate: bool = True, force: bool = False) -> pd.DataFrame:
+    # One open and one extract_tables() per page, read from the disk cache unless `force`;
+    # validation uses the same results
+    pages = cached_page_tables(upload_file.getvalue(), force=force)
+    if validate and not any(pages):
+        st.error("No detectable tables found in the PDF. "
+                 "Please upload a PDF exported from Excel/Sheets with clear table borders.")
+        st.stop()
 
-    df = pd.DataFrame()
-    last_header = None
-
-    with pdfplumber.open(upload_file) as pdf:
-        for page_num, page in enumerate(pdf.pages, start=1):
-            rows = []
-            tables = page.extract_tables()
-            if not tables:
-                continue
-
-            for table in tables:
-                if table and any(any(cell for cell in row) for row in table):
-                    rows.extend(table)
-
-            if not rows:
-                continue
-
-            for potential_header in rows:
-                if any(cell and cell.strip() for cell in potential_header):
-                    header = [h.strip().replace("\u200b", "") if h else "" for h in potential_header]
-                    rows = rows[rows.index(potential_header) + 1:]
-                    break
-            else:
-                continue
-
-            df_page = pd.DataFrame(rows, columns=header)
-            df_page = df_page.loc[:, ~df_page.columns.str.contains("^Unnamed")]
-
-            if df.empty:
-                df = df_page
-                last_header = header
-            else:
-                if header == last_header:
-                    df = pd.concat([df, df_page], ignore_index=True)
-                else:
-                    max_len = max(len(df), len(df_page))
-                    df = df.reindex(range(max_len)).reset_index(drop=True)
-                    df_page = df_page.reindex(range(max_len)).reset_index(drop=True)
-                    df = pd.concat([df, df_page], axis=1)
-                    last_header = header
+    df = merge_page_tables(pages)
 
     try:
         from constant import SCORING_RULES
@@ -183,4 +185,3 @@ def parse_pdf_flexible(upload_file, validate: bool = True) -> pd.DataFrame:
         pass
 
     return df
-
@@ -0,0 +1,53 @@
+"""Local HTTP scoring service for other tools, e.g.:
+
+    python serve.py --config weights.yaml --port 8765
+
+POST /evaluate, /risks or /score-table with {"rows": [...records...], "config": {...}} (or an Arrow IPC
+stream, settings in the X-Scoring-Config header); send "Accept: application/vnd.apache.arrow.stream"
+for Arrow results. Concurrent requests with the same settings are scored together in one batch.
+"""
+import argparse
+import asyncio
+import logging
+import sys
+
+import yaml
+
+from services.scoring_service import BATCH_MAX_ROWS, BATCH_WINDOW_S, MicroBatcher, ScoringService, serve
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Serve startup scoring over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="port (default: 8765)")
+    parser.add_argument("--config", help="YAML with default profile, weights, thresholds and milestone")
+    parser.add_argument("--batch-window-ms", type=float, default=BATCH_WINDOW_S * 1000,
+                        help="how long to collect concurrent requests into one batch")
+    parser.add_argument("--batch-max-rows", type=int, default=BATCH_MAX_ROWS,
+                        help="send a batch as soon as it has this many rows")
+    parser.add_argument("--workers", type=int, help="scoring processes (default: one per CPU)")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        defaults = {}
+        if args.config:
+            with open(args.config, "r", encoding="utf-8") as fh:
+                defaults = yaml.safe_load(fh) or {}
+        service = ScoringService(defaults, MicroBatcher(args.batch_window_ms / 1000, args.batch_max_rows, args.workers))
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+# services/batch.py
+
+import os
+import traceback
+from concurrent.futures import as_completed
+from pathlib import Path
+from typing import Dict, List
+
+import pandas as pd
+import yaml
+
+from constant import COMPANY_COL, SCORING_RULES
+from services.evaluation import evaluate
+from services.ingest import COLUMNAR_FORMATS, STREAM_CSV_MIN_BYTES, read_columnar, stream_csv
+from services.milestones import MILESTONE_OPS
+from services.scoring import normalize_weights
+from services.scoring_model import DEFAULT_PROFILE, load_profile
+from services.utils import clean_frame, filter_months
+from services.workers import pool_workers, process_pool
+from services.xlsx_tables import read_xlsx
+
+INPUT_FORMATS = ("csv", "xlsx", *COLUMNAR_FORMATS)
+OUTPUT_FORMATS = ("csv", "parquet")
+
+# Same starting point as the dashboard's weight sliders
+DEFAULT_RAW_WEIGHT = 10
+
+
+def _milestone_config(milestone) -> dict:
+    if not milestone:
+        return {"enabled": False, "field": None, "op": None, "threshold": None}
+
+    conditions = milestone.get("conditions") or [
+        {k: milestone.get(k) for k in ("field", "op", "threshold")}
+    ]
+    for cond in conditions:
+        if cond.get("field") not in SCORING_RULES:
+            raise ValueError(f"Milestone field must be one of the scoring metrics, got {cond.get('field')!r}")
+        if cond.get("op") not in MILESTONE_OPS:
+            raise ValueError(f"Milestone operator must be one of {', '.join(MILESTONE_OPS)}, got {cond.get('op')!r}")
+        cond["threshold"] = float(cond["threshold"])
+    if milestone.get("logic", "and") not in ("and", "or"):
+        raise ValueError("Milestone logic must be 'and' or 'or'")
+
+    return {
+        "enabled": True,
+        "field": conditions[0]["field"],
+        "op": conditions[0]["op"],
+        "threshold": conditions[0]["threshold"],
+        "conditions": conditions,
+        "logic": milestone.get("logic", "and"),
+        "sustain": int(milestone.get("sustain", 1)),
+    }
+
+
+def load_run_config(path=None) -> dict:
+    """Scoring settings from a YAML file (see run_config() for the keys)."""
+    settings = {}
+    if path:
+        with open(path, "r", encoding="utf-8") as fh:
+            settings = yaml.safe_load(fh) or {}
+        if not isinstance(settings, dict):
+            raise ValueError(f"{path}: expected a mapping of settings")
+    return run_config(settings)
+
+
+def run_config(settings: dict) -> dict:
+    """Scoring settings read the way the dashboard sidebar reads its controls.
+
+    Keys (all optional): profile, weights (raw, per metric; unlisted metrics get the slider default),
+    age_threshold, score_threshold, milestone ({conditions: [{field, op, threshold}], logic, sustain}
+    or a single field/op/threshold).
+    """
+    raw_weights = settings.get("weights") or {}
+    unknown = [m for m in raw_weights if m not in SCORING_RULES]
+    if unknown:
+        raise ValueError(f"Unknown metrics in weights: {', '.join(unknown)}")
+    weights = {m: float(raw_weights.get(m, DEFAULT_RAW_WEIGHT)) for m in SCORING_RULES}
+
+    return {
+        "norm_weights": normalize_weights(weights),
+        "model": load_profile(settings.get("profile", DEFAULT_PROFILE)),
+        "age_threshold": int(settings.get("age_threshold", 12)),
+        "score_threshold": float(settings.get("score_threshold", 60)),
+        "milestone_config": _milestone_config(settings.get("milestone")),
+    }
+
+
+def read_input(path, month_range=None) -> pd.DataFrame:
+    """Load a CSV, XLSX, Parquet or Arrow/Feather file as the uploader does.
+
+    Large CSVs come back already cleaned (with df.attrs["clean_notices"]); columnar files read only the
+    scoring columns and, for integer or date months, skip rows outside `month_range` while reading.
+    """
+    ext = Path(path).suffix.lower().lstrip(".")
+    if ext == "csv":
+        if os.path.getsize(path) >= STREAM_CSV_MIN_BYTES:
+            return stream_csv(path)[0]
+        return pd.read_csv(path)
+    if ext == "xlsx":
+        return read_xlsx(Path(path).read_bytes())
+    if ext in COLUMNAR_FORMATS:
+        return read_columnar(path, ext, month_range)
+    raise ValueError(f"Unsupported input format '.{ext}'; expected one of {', '.join(INPUT_FORMATS)}")
+
+
+def output_stems(paths: List[str]) -> List[str]:
+    """Output name stem per input: the file name, numbered when an earlier input already uses it
+    (a/x.csv and b/x.csv, or x.csv and x.parquet, would otherwise overwrite each other)."""
+    taken, stems = set(), []
+    for path in paths:
+        base = stem = Path(path).stem
+        n = 1
+        # casefold: x.csv and X.csv collide on case-insensitive file systems
+        while stem.casefold() in taken:
+            n += 1
+            stem = f"{base}_{n}"
+        taken.add(stem.casefold())
+        stems.append(stem)
+    return stems
+
+
+def score_file(path, config: dict, out_dir, fmt: str = "csv", pdf: bool = False, compact: bool = False,
+               month_range=None, stem: str = None) -> dict:
+    """Clean, score and write one input file to <out_dir>/<stem>_scored.<fmt> (stem: the file name).
+
+    Returns a summary (input, output, rows, companies, warnings, reports, report_errors); cleaning
+    notices come back in `warnings` rather than being shown anywhere.
+    """
+    raw = read_input(path, month_range)
+    if "clean_notices" in raw.attrs:
+        df, warnings = raw, list(raw.attrs["clean_notices"])
+    else:
+        df, warnings = clean_frame(raw)
+    df = filter_months(df, month_range)
+    if df.empty:
+        raise ValueError("No rows left to score after cleaning and the month filter.")
+
+    scored = evaluate(df, config["norm_weights"], config["age_threshold"], config["score_threshold"],
+                      config["milestone_config"], config["model"])
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stem = stem or Path(path).stem
+    output = out_dir / f"{stem}_scored.{fmt}"
+    if fmt == "parquet":
+        scored.to_parquet(output, index=False)
+    else:
+        scored.to_csv(output, index=False)
+
+    summary = {
+        "input": str(path),
+        "output": str(output),
+        "rows": len(scored),
+        "companies": int(scored[COMPANY_COL].nunique()) if COMPANY_COL in scored.columns else 1,
+        "warnings": [w.strip() for w in warnings],
+        "reports": None,
+        "report_errors": {},
+    }
+    if pdf:
+        summary.update(_write_reports(scored, df, config, out_dir / stem, compact))
+    return summary
+
+
+def _write_reports(scored, df, config, base: Path, compact: bool) -> dict:
+    # The report builders draw with plotly/fpdf and live next to the dashboard; only imported when asked for
+    from services.bulk_reports import write_bulk_reports
+    from services.export_utils import build_company_report
+
+    settings = dict(score_threshold=config["score_threshold"], age_threshold=config["age_threshold"],
+                    milestone_config=config["milestone_config"], compact=compact, rules=config["model"].rules)
+    if COMPANY_COL in scored.columns:
+        path = base.with_name(f"{base.name}_reports.zip")
+        with open(path, "wb") as fh:
+            errors = write_bulk_reports(fh, scored, df, **settings)
+        return {"reports": str(path), "report_errors": errors}
+
+    path = base.with_name(f"{base.name}_diagnostic.pdf")
+    try:
+        path.write_bytes(build_company_report(scored, df, **settings))
+    except Exception as e:
+        # The scored output is already written; a failed report does not fail the file
+        return {"reports": None, "report_errors": {base.name: f"{type(e).__name__}: {e}"}}
+    return {"reports": str(path), "report_errors": {}}
+
+
+def _score_file_job(path, stem, *args) -> dict:
+    # One bad file is reported in its summary instead of stopping the batch
+    try:
+        return score_file(path, *args, stem=stem)
+    except Exception as e:
+        return {"input": str(path), "error": f"{type(e).__name__}: {e}",
+                "traceback": traceback.format_exc(limit=5)}
+
+
+def score_files(paths: List[str], config: dict, out_dir, fmt: str = "csv", pdf: bool = False,
+                compact: bool = False, month_range=None, workers: int = None) -> List[Dict]:
+    """score_file() for every path, `workers` files at a time (default: one per CPU) on a process pool.
+
+    Inputs with the same file name get numbered outputs (x_scored.csv, x_2_scored.csv). Summaries come
+    back in input order; a file that fails has an `error` entry instead of outputs.
+    """
+    args = (config, out_dir, fmt, pdf, compact, month_range)
+    stems = output_stems(paths)
+    workers = pool_workers(workers)
+    if min(workers, len(paths)) < 2:
+        return [_score_file_job(path, stem, *args) for path, stem in zip(paths, stems)]
+
+    futures = {process_pool(workers).submit(_score_file_job, path, stem, *args): i
+               for i, (path, stem) in enumerate(zip(paths, stems))}
+    summaries = [None] * len(paths)
+    for future in as_completed(futures):
+        i = futures[future]
+        try:
+            summaries[i] = future.result()
+        except Exception as e:
+            # The worker itself died (e.g. out of memory); the other files keep their results
+            summaries[i] = {"input": str(paths[i]), "error": f"{type(e).__name__}: {e}", "traceback": ""}
+    return summaries
@@ -0,0 +1,119 @@
+# services/bulk_reports.py
+
+import re
+import traceback
+import zipfile
+from concurrent.futures import as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+
+from constant import COMPANY_COL
+from services.export_utils import build_company_report
+from services.workers import pool_workers, process_pool
+
+ProgressFn = Callable[[int, int, str], None]
+
+
+def _company_frames(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    return {company: part.reset_index(drop=True) for company, part in df.groupby(COMPANY_COL, sort=False)}
+
+
+def _report_job(company, df_scored, df, settings: dict):
+    # Runs in a worker process; a failing company is reported, not raised, so the batch goes on
+    try:
+        return company, build_company_report(df_scored, df, **settings), None
+    except Exception as e:
+        return company, None, f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=3)}"
+
+
+def _run_on_pool(jobs, workers, lost):
+    # Yields each job's result as it finishes; jobs lost to a dead worker are appended to `lost` instead
+    futures = {}
+    for job in jobs:
+        try:
+            futures[process_pool(workers).submit(_report_job, *job)] = job
+        except BrokenProcessPool:
+            lost.append(job)
+    for future in as_completed(futures):
+        try:
+            yield future.result()
+        except BrokenProcessPool:
+            lost.append(futures[future])
+        except Exception as e:
+            yield futures[future][0], None, f"{type(e).__name__}: {e}"
+
+
+def _pool_results(jobs, workers):
+    lost = []
+    yield from _run_on_pool(jobs, workers, lost)
+
+    # A worker died and took every report in flight with it; resubmit those together on a fresh pool
+    lost_again = []
+    yield from _run_on_pool(lost, workers, lost_again)
+
+    # Lost twice: run these one at a time, so only the company that kills its worker every time fails
+    for job in lost_again:
+        try:
+            yield process_pool(workers).submit(_report_job, *job).result()
+        except Exception as e:
+            yield job[0], None, f"{type(e).__name__}: {e}"
+
+
+def report_filename(company, taken: set) -> str:
+    stem = re.sub(r"[^\w.-]+", "_", str(company)).strip("._") or "company"
+    name, n = f"{stem}_diagnostic.pdf", 1
+    while name in taken:
+        n += 1
+        name = f"{stem}_{n}_diagnostic.pdf"
+    taken.add(name)
+    return name
+
+
+def write_bulk_reports(out, df_portfolio_scored: pd.DataFrame, df_portfolio: pd.DataFrame, score_threshold: float,
+                       age_threshold: int, milestone_config: dict, compact: bool = False,
+                       progress: Optional[ProgressFn] = None, workers: int = None,
+                       rules: dict = None) -> Dict[str, str]:
+    """Write one diagnostic PDF per company into a ZIP on `out`, each as soon as it is built.
+
+    Reports are built in parallel on a pool of `workers` processes (default: one per CPU). Companies whose
+    report fails, and rows without a company id, are listed in errors.txt inside the archive and returned
+    as {company: error}; `progress(done, total, company)` is called after every company.
+    """
+    if COMPANY_COL not in df_portfolio_scored.columns:
+        raise ValueError(f"Bulk reports need a '{COMPANY_COL}' column.")
+
+    scored_by_company = _company_frames(df_portfolio_scored)
+    frames_by_company = _company_frames(df_portfolio) if COMPANY_COL in df_portfolio.columns else {}
+    settings = dict(score_threshold=score_threshold, age_threshold=age_threshold,
+                    milestone_config=milestone_config, compact=compact, rules=rules)
+    jobs = [(company, scored, frames_by_company.get(company, scored), settings)
+            for company, scored in scored_by_company.items()]
+
+    workers = pool_workers(workers)
+    if min(workers, len(jobs)) < 2:
+        results = (_report_job(*job) for job in jobs)
+    else:
+        results = _pool_results(jobs, workers)
+
+    # Names are fixed in portfolio order, whatever order the reports finish in
+    taken = set()
+    filenames = {company: report_filename(company, taken) for company in scored_by_company}
+    errors = {}
+    # groupby drops rows without a company id; say so rather than leave them out silently
+    n_unassigned = int(df_portfolio_scored[COMPANY_COL].isna().sum())
+    if n_unassigned:
+        errors[f"(no {COMPANY_COL})"] = f"{n_unassigned} rows have no {COMPANY_COL} and get no report."
+    # PDFs are already compressed; storing them keeps the archive cheap to write
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_STORED) as zf:
+        for done, (company, pdf_bytes, error) in enumerate(results, start=1):
+            if error is None:
+                zf.writestr(filenames[company], pdf_bytes)
+            else:
+                errors[str(company)] = error
+            if progress:
+                progress(done, len(jobs), str(company))
+        if errors:
+            zf.writestr("errors.txt", "\n\n".join(f"{company}\n{error}" for company, error in errors.items()))
+    return errors
@@ -0,0 +1,138 @@
+# services/cache.py
+
+import hashlib
+import json
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from constant import RESULT_CACHE_MAX_MB
+
+_MISSING = object()
+
+
+def content_key(*parts) -> str:
+    """Stable hash of bytes / strings / JSON-able parts, used as a cache key."""
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, (bytes, bytearray, memoryview)):
+            h.update(part)
+        else:
+            h.update(json.dumps(part, sort_keys=True, default=str).encode())
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+def frame_digest(df: pd.DataFrame) -> str:
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return content_key(list(map(str, df.columns)), row_hashes.tobytes())
+
+
+def _sizeof(value) -> int:
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(deep=True).sum()) if isinstance(value, pd.DataFrame) \
+            else int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_sizeof(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_sizeof(v) for v in value)
+    if hasattr(value, "to_plotly_json") and hasattr(value, "to_json"):
+        # Plotly figures keep their trace data out of sys.getsizeof's sight; the serialized size tracks it
+        return len(value.to_json())
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """Thread-safe, process-wide LRU cache bounded by the estimated size of its values.
+
+    Concurrent misses on the same key compute once; the other callers wait for that result.
+    Cached values are shared between sessions and must be treated as read-only.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._sizes = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, key):
+        with self._lock:
+            if key not in self._items:
+                return _MISSING
+            self._items.move_to_end(key)
+            self.hits += 1
+            return self._items[key]
+
+    def get(self, key, default=None):
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def put(self, key, value):
+        size = _sizeof(value)
+        with self._lock:
+            if key in self._items:
+                self.current_bytes -= self._sizes.pop(key)
+                del self._items[key]
+            if size > self.max_bytes:
+                return
+            self._items[key] = value
+            self._sizes[key] = size
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                old_key, _ = self._items.popitem(last=False)
+                self.current_bytes -= self._sizes.pop(old_key)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        value = self._lookup(key)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            key_lock = self._inflight.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                value = self._lookup(key)
+                if value is _MISSING:
+                    with self._lock:
+                        self.misses += 1
+                    value = compute()
+                    self.put(key, value)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._sizes.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._items),
+                "used_mb": self.current_bytes / 1024 ** 2,
+                "max_mb": self.max_bytes / 1024 ** 2,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+RESULT_CACHE = ResultCache(RESULT_CACHE_MAX_MB * 1024 ** 2)
@@ -0,0 +1,37 @@
+# services/diagnostics.py
+
+import pandas as pd
+
+
+def generate_score_table(df_scored, scoring_rules):
+    return pd.DataFrame([
+        {
+            "Metric": m,
+            "Raw": f"{df_scored[m].iloc[-1]:.2f}" if m in df_scored else "N/A",
+            "Weight": f"{df_scored[f'W_{m}'].iloc[-1]:.0f}%" if f"W_{m}" in df_scored else "N/A",
+            "Score": f"{df_scored[f'S_{m}'].iloc[-1]:.0f}" if f"S_{m}" in df_scored else "N/A"
+        }
+        for m in scoring_rules
+    ])
+
+def extract_diagnostic_info(df_scored):
+    quadrant = df_scored["Quadrant"].iloc[-1] if "Quadrant" in df_scored else "Unknown"
+    trend = df_scored["VelocityTrend"].iloc[-1] if "VelocityTrend" in df_scored else "Flat"
+    composite_score = df_scored["CompositeScore"].iloc[-1] if "CompositeScore" in df_scored else 0
+    return quadrant, trend, composite_score
+
+def detect_risks(df_scored):
+    risks = []
+    latest = df_scored.iloc[-1]
+
+    if "BurnRate_kUSD" in latest and "RevenueGrowRate" in latest:
+        if latest["BurnRate_kUSD"] > latest["RevenueGrowRate"] * 10:
+            risks.append("Burn rate significantly exceeds revenue growth")
+
+    if "ChurnRate_%" in latest and latest["ChurnRate_%"] > 20:
+        risks.append("Churn rate exceeds 20%")
+
+    if "CustomerRetentionRate_%" in latest and latest["CustomerRetentionRate_%"] < 50:
+        risks.append("Customer retention below 50%")
+
+    return risks
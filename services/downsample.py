@@ -0,0 +1,66 @@
+# services/downsample.py
+
+import numpy as np
+import pandas as pd
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: positions of `n_out` points that keep the visual shape of (x, y).
+
+    x must be sorted. The first and last points are always kept.
+    """
+    n = len(x)
+    n_out = max(n_out, 3)
+    if n_out >= n:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_hi = edges[i + 2] if i + 2 < len(edges) else n
+        # Third corner of the triangle: the average of the next bucket (the last point for the final bucket)
+        cx, cy = x[hi:nxt_hi].mean(), y[hi:nxt_hi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample_rows(df: pd.DataFrame, x_col: str, y_col: str, max_points: int,
+                    keep: np.ndarray = None, group_col: str = None) -> np.ndarray:
+    """Sorted positions of the rows to draw: at most about `max_points` chosen by LTTB on (x, y).
+
+    With `group_col`, every group gets a share of the budget proportional to its size and is
+    reduced on its own. Rows flagged in the boolean `keep` array are always included, up to half of
+    the budget; beyond that they are thinned by LTTB too.
+    """
+    n = len(df)
+    keep_mask = np.zeros(n, dtype=bool) if keep is None else np.asarray(keep, dtype=bool).copy()
+    if n <= max_points:
+        return np.arange(n)
+
+    x = df[x_col].to_numpy(dtype=float)
+    y = df[y_col].to_numpy(dtype=float)
+    y = np.where(np.isnan(y), np.nanmean(y) if np.isfinite(y).any() else 0.0, y)
+    if group_col is not None and group_col in df.columns:
+        groups = pd.factorize(df[group_col])[0]
+        order = np.lexsort((x, groups))
+        bounds = np.flatnonzero(np.diff(groups[order])) + 1
+        runs = np.split(order, bounds)
+    else:
+        runs = [np.argsort(x, kind="stable")]
+
+    keep_budget = max_points // 2
+    if np.count_nonzero(keep_mask) > keep_budget:
+        kept = np.flatnonzero(keep_mask)
+        keep_mask[:] = False
+        keep_mask[kept[downsample_rows(df.iloc[kept], x_col, y_col, keep_budget, group_col=group_col)]] = True
+
+    ratio = (max_points - np.count_nonzero(keep_mask)) / n
+    for rows in runs:
+        n_out = max(3, int(round(len(rows) * ratio)))
+        keep_mask[rows[lttb(x[rows], y[rows], n_out)]] = True
+    return np.flatnonzero(keep_mask)
@@ -1,129 +1,229 @@
-from typing import Dict
+from typing import Dict, List
 
 import numpy as np
 import pandas as pd
 
+from constant import COMPANY_COL, QUADRANT_LABELS
+from services.milestones import milestone_maturity
+from services.scoring_model import ScoringModel, load_profile
 
-def _normalize(val, rule: dict) -> float:
-    if not isinstance(rule, dict) or not all(k in rule for k in ("good", "bad", "hib")):
-        return np.nan
-    try:
-        val = float(val)
-    except (TypeError, ValueError):
-        return np.nan
-    if np.isnan(val):
-        return np.nan
-
-    g, b, hib = rule["good"], rule["bad"], rule["hib"]
-    denom = (g - b) if hib else (b - g)
-    if denom == 0 or pd.isna(denom):
-        return np.nan
-
-    score = ((val - b) / denom if hib else (b - val) / denom)
-    return float(np.clip(score, 0.0, 1.0) * 100.0)
-
-
-def _row_score(row: pd.Series, weights: Dict[str, float]) -> float:
-    total, w_sum = 0.0, 0.0
-    for m, w in weights.items():
-        if m not in row or pd.isna(row[m]):
-            continue
-        score = _normalize(row[m], SCORING_RULES[m])
-        if not np.isnan(score):
-            total += score * w
-            w_sum += w
-    return total / w_sum if w_sum else np.nan
-
-from constant import QUADRANT_LABELS, SCORING_RULES
-
-
-def _quadrant_rule(score, score_threshold=60, is_mature=False):
-    if score >= score_threshold and is_mature:
-        return QUADRANT_LABELS["q1"]  # Technologically Elite
-    elif score >= score_threshold and not is_mature:
-        return QUADRANT_LABELS["q2"]  # Feasible
-    elif score < score_threshold and is_mature:
-        return QUADRANT_LABELS["q4"]  # Failing
-    else:
-        return QUADRANT_LABELS["q3"]  # Pre-Concept Barrier
+CLASSIFICATION_COLS = ["_is_mature", "Quadrant"]
 
 
+def score_matrix(df: pd.DataFrame, metrics: List[str], model: ScoringModel = None) -> np.ndarray:
+    """Normalized 0-100 score per (row, metric); NaN where the value or rule is unusable."""
+    model = model or load_profile()
+    good, bad, hib, denom = model.arrays(metrics)
 
-def evaluate(df, weights, age_threshold=12, score_threshold=60, milestone_config=None):
-    out = df.copy()
-    out["CompositeScore"] = out.apply(_row_score, axis=1, weights=weights)
-
-    for m in weights:
-        if m in out.columns:
-            col_num = pd.to_numeric(out[m], errors="coerce")
-            out[f"S_{m}"] = col_num.apply(
-                lambda v: _normalize(v, SCORING_RULES[m])
-            ).fillna(0.0)
-        else:
-            out[f"S_{m}"] = 0.0
-        out[f"W_{m}"] = weights[m] * 100
-
-    def _weakest_metric(row):
-        scores = {
-            m: row[f"S_{m}"] * weights[m]
-            if f"S_{m}" in row and not pd.isna(row[f"S_{m}"])
-            else np.inf
-            for m in weights
-        }
-        return min(scores, key=scores.get) if scores else None
-
-    out["LaggingMetric"] = (
-        out.apply(_weakest_metric, axis=1)
-            .str.replace("_%", "", regex=False)
-            .str.replace("_kUSD", "", regex=False)
+    raw = np.full((len(df), len(metrics)), np.nan)
+    for j, m in enumerate(metrics):
+        if m in df.columns:
+            raw[:, j] = pd.to_numeric(df[m], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+    with np.errstate(invalid="ignore"):
+        score = np.where(hib, raw - bad, bad - raw) / denom
+    return np.clip(score, 0.0, 1.0) * 100.0
+
+
+def _composite(scores: np.ndarray, w: np.ndarray) -> np.ndarray:
+    # Weights of metrics with no score drop out of the denominator, row by row.
+    valid = ~np.isnan(scores)
+    total = np.where(valid, scores, 0.0) @ w
+    w_sum = valid @ w
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(w_sum != 0, total / w_sum, np.nan)
+
+
+def _lagging_metric(filled_scores: np.ndarray, w: np.ndarray, metrics: List[str]) -> np.ndarray:
+    if not metrics:
+        return np.full(len(filled_scores), None, dtype=object)
+    labels = np.array([m.replace("_%", "").replace("_kUSD", "") for m in metrics], dtype=object)
+    return labels[np.argmin(filled_scores * w, axis=1)]
+
+
+def quadrant_labels(score: np.ndarray, is_mature: np.ndarray, score_threshold=60) -> np.ndarray:
+    with np.errstate(invalid="ignore"):
+        high = score >= score_threshold
+    return np.select(
+        [np.isnan(score), high & is_mature, high, is_mature],
+        [QUADRANT_LABELS["q0"], QUADRANT_LABELS["q1"], QUADRANT_LABELS["q2"], QUADRANT_LABELS["q4"]],
+        default=QUADRANT_LABELS["q3"],
     )
 
-    out["_is_mature"] = False
+
+def company_groups(df: pd.DataFrame) -> pd.Series:
+    if COMPANY_COL in df.columns:
+        return df[COMPANY_COL]
+    return pd.Series(0, index=df.index)
+
+
+def score_rows(df: pd.DataFrame, weights: Dict[str, float], model: ScoringModel = None) -> pd.DataFrame:
+    # Row-local part of score_frame (everything but Delta/Trend), so rows can be scored in any grouping
+    out = df.copy()
+    metrics = list(weights)
+    w = np.array([weights[m] for m in metrics], dtype=float)
+
+    scores = score_matrix(out, metrics, model)
+    out["CompositeScore"] = _composite(scores, w)
+
+    filled = np.nan_to_num(scores, nan=0.0)
+    score_cols = {}
+    for j, m in enumerate(metrics):
+        score_cols[f"S_{m}"] = filled[:, j]
+        score_cols[f"W_{m}"] = weights[m] * 100
+    stale = [c for c in score_cols if c in out.columns]
+    if stale:
+        out = out.drop(columns=stale)
+    out = pd.concat([out, pd.DataFrame(score_cols, index=out.index)], axis=1)
+
+    out["LaggingMetric"] = _lagging_metric(filled, w, metrics)
+    return out
+
+
+def _maturity(out: pd.DataFrame, groups: pd.Series, age_threshold=12, milestone_config=None,
+              prior: pd.DataFrame = None):
+    # `prior` is a boundary state (see boundary_state) for rows that continue an already scored history.
+    # Returns (is_mature, milestone run length or None).
+    by_company = dict(sort=False, dropna=False)
+
     if milestone_config and milestone_config.get("enabled"):
-        field = milestone_config.get("field")
-        op = milestone_config.get("op")
-        threshold = milestone_config.get("threshold")
-
-        if field in out.columns:
-            if op == ">=":
-                mature_mask = out[field] >= threshold
-            elif op == "<=":
-                mature_mask = out[field] <= threshold
-            else:
-                raise ValueError("Unsupported milestone operator")
-
-            met_indices = out.index[mature_mask]
-            if len(met_indices) > 0:
-                first_idx = met_indices[0]
-                out.loc[first_idx:, "_is_mature"] = True
+        prior_run = prior_mature = None
+        if prior is not None:
+            prior_run = groups.map(prior["MilestoneRun"]).fillna(0).to_numpy()
+            prior_mature = groups.map(prior["_is_mature"]).fillna(False).to_numpy(dtype=bool)
+        is_mature, run = milestone_maturity(out, milestone_config, groups, prior_run, prior_mature)
+        return pd.Series(is_mature, index=out.index), run
+
+    if "Month_Index" in out.columns:
+        is_mature = out["Month_Index"] >= (age_threshold-1)
+    elif "Month" in out.columns and len(out) > 0:
+        min_month = out["Month"].groupby(groups, **by_company).transform("min")
+        if prior is not None:
+            min_month = groups.map(prior["FirstMonth"]).fillna(min_month).astype(int)
+        start_year = min_month // 100
+        start_m = min_month % 100
+
+        total_months = (start_year * 12 + start_m - 1) + age_threshold
+        cutoff_year = total_months // 12
+        cutoff_month = (total_months % 12) + 1
+        cutoff_yyyymm = cutoff_year * 100 + cutoff_month
+
+        is_mature = out["Month"] >= cutoff_yyyymm
     else:
-        if "Month_Index" in out.columns:
-            out["_is_mature"] = out["Month_Index"] >= (age_threshold-1)
-        else:
-            if "Month" in out.columns and len(out) > 0:
-                min_month = out["Month"].min()
-                start_year = min_month // 100
-                start_m = min_month % 100
-
-                total_months = (start_year * 12 + start_m - 1) + age_threshold
-                cutoff_year = total_months // 12
-                cutoff_month = (total_months % 12) + 1
-                cutoff_yyyymm = cutoff_year * 100 + cutoff_month
-
-                out["_is_mature"] = out["Month"] >= cutoff_yyyymm
-            else:
-                out["_is_mature"] = out.index >= (age_threshold-1)
-
-    def _label(r):
-        if np.isnan(r["CompositeScore"]):
-            return "Incomplete"
-        return _quadrant_rule(r["CompositeScore"], score_threshold, r["_is_mature"])
-
-    out["Quadrant"] = out.apply(_label, axis=1)
-    out["Delta"] = out["CompositeScore"].diff()
-    out.loc[out.index[0], "Delta"] = 0
-    out["Trend"] = pd.cut(out["Delta"], [-np.inf, -0.5, 0.5, np.inf], labels=["down", "flat", "up"])
+        position = out.groupby(groups, **by_company).cumcount()
+        if prior is not None:
+            position += groups.map(prior["Rows"]).fillna(0).astype(int)
+        is_mature = position >= (age_threshold-1)
+
+    return is_mature, None
 
+
+def _delta(composite: pd.Series, groups: pd.Series, prior: pd.DataFrame = None) -> pd.Series:
+    delta = composite.groupby(groups, sort=False, dropna=False).diff()
+    first = ~groups.duplicated()
+    delta[first] = 0
+    if prior is not None:
+        # Boundary rows continue from the last month of the scored history
+        continued = first & groups.isin(prior.index)
+        delta[continued] = composite[continued] - groups[continued].map(prior["CompositeScore"])
+    return delta
+
+
+def _trend(delta: pd.Series) -> pd.Series:
+    return pd.cut(delta, [-np.inf, -0.5, 0.5, np.inf], labels=["down", "flat", "up"])
+
+
+def score_frame(df, weights: Dict[str, float], model: ScoringModel = None, prior: pd.DataFrame = None):
+    """Weight-dependent columns: per-metric scores, CompositeScore, LaggingMetric, Delta and Trend."""
+    return add_trend(score_rows(df, weights, model), prior)
+
+
+def add_trend(out: pd.DataFrame, prior: pd.DataFrame = None) -> pd.DataFrame:
+    """Delta/Trend for rows that already carry CompositeScore and are in (company, month) order."""
+    out["Delta"] = _delta(out["CompositeScore"], company_groups(out), prior)
+    out["Trend"] = _trend(out["Delta"])
     return out
 
 
+def _classify_into(out: pd.DataFrame, age_threshold=12, score_threshold=60, milestone_config=None,
+                   prior: pd.DataFrame = None):
+    # Adds the stage columns to `out` in place; returns the milestone run length per row (or None) for
+    # boundary_state, which is all it is needed for
+    is_mature, run = _maturity(out, company_groups(out), age_threshold, milestone_config, prior)
+    columns = {"_is_mature": is_mature.to_numpy(dtype=bool)}
+    composite = out["CompositeScore"].to_numpy(dtype=float)
+    columns["Quadrant"] = quadrant_labels(composite, columns["_is_mature"], score_threshold)
+
+    # Same column layout as a single pass: stage columns sit before Delta/Trend
+    loc = out.columns.get_loc("Delta") if "Delta" in out.columns else len(out.columns)
+    for offset, (name, values) in enumerate(columns.items()):
+        out.insert(loc + offset, name, values)
+    return run
+
+
+def classify(scored: pd.DataFrame, age_threshold=12, score_threshold=60, milestone_config=None,
+             prior: pd.DataFrame = None) -> pd.DataFrame:
+    """Stage-dependent columns of a score_frame() result: _is_mature and Quadrant."""
+    out = scored.drop(columns=[c for c in CLASSIFICATION_COLS if c in scored.columns])
+    _classify_into(out, age_threshold, score_threshold, milestone_config, prior)
+    return out
+
+
+def evaluate(df, weights: Dict[str, float], age_threshold=12, score_threshold=60, milestone_config=None,
+             model: ScoringModel = None):
+    out = score_frame(df, weights, model)
+    _classify_into(out, age_threshold, score_threshold, milestone_config)
+    return out
+
+
+def evaluate_with_state(df, weights: Dict[str, float], age_threshold=12, score_threshold=60, milestone_config=None,
+                        model: ScoringModel = None):
+    """evaluate() and the boundary_state() of its result, which also carries the milestone run lengths."""
+    out = score_frame(df, weights, model)
+    run = _classify_into(out, age_threshold, score_threshold, milestone_config)
+    return out, boundary_state(out, run)
+
+
+def boundary_state(scored: pd.DataFrame, milestone_run=None) -> pd.DataFrame:
+    """Per-company summary of a scored history: everything needed to score the months that follow it.
+
+    `milestone_run` is the per-row run length _maturity() returned while classifying `scored`, if any.
+    """
+    groups = company_groups(scored)
+    is_last = ~groups.duplicated(keep="last")
+    last = scored.loc[is_last]
+    state = pd.DataFrame({
+        "Month": last["Month"].to_numpy() if "Month" in last.columns else np.nan,
+        "CompositeScore": last["CompositeScore"].to_numpy(dtype=float),
+        "_is_mature": last["_is_mature"].to_numpy(dtype=bool) if "_is_mature" in last.columns else False,
+        "MilestoneRun": np.asarray(milestone_run)[is_last.to_numpy()] if milestone_run is not None else 0,
+    }, index=pd.Index(groups[last.index].to_numpy(), name=COMPANY_COL))
+    by_company = scored.groupby(groups, sort=False, dropna=False)
+    state["Rows"] = by_company.size().reindex(state.index).to_numpy()
+    state["FirstMonth"] = (
+        by_company["Month"].min().reindex(state.index).to_numpy() if "Month" in scored.columns else np.nan
+    )
+    return state
+
+
+def evaluate_incremental(state: pd.DataFrame, new_rows: pd.DataFrame, weights: Dict[str, float],
+                         age_threshold=12, score_threshold=60, milestone_config=None,
+                         model: ScoringModel = None, classify_rows=True):
+    """Score months appended after a history summarized by `state`; returns (scored rows, updated state).
+
+    Only `new_rows` are scored. Delta/Trend at the boundary and maturity are carried over from `state`,
+    so the result matches evaluate() on the full history as long as the weights, rules, thresholds and
+    milestone are unchanged. With `classify_rows=False` only the score_frame() columns are added.
+    """
+    out = score_frame(new_rows, weights, model, prior=state)
+    run = None
+    if classify_rows:
+        run = _classify_into(out, age_threshold, score_threshold, milestone_config, prior=state)
+
+    update = boundary_state(out, run)
+    seen = update.index.isin(state.index)
+    update.loc[seen, "Rows"] += state.loc[update.index[seen], "Rows"].to_numpy()
+    update.loc[seen, "FirstMonth"] = state.loc[update.index[seen], "FirstMonth"].to_numpy()
+    state = pd.concat([state.drop(index=update.index[seen]), update])
+
+    return out, state
@@ -1,20 +1,76 @@
+import hashlib
+import struct
 import textwrap
 
 from PIL import Image
 from fpdf import FPDF
-from typing import List
+from typing import List, Tuple
 import pandas as pd
-import tempfile
 
-from components.dashboard_blocks import render_block_for_pdf, DEFAULT_CHART_TYPES
-from constant import DASHBOARD_TITLES
-from metric_clusters import ALL_METRIC_CLUSTERS
+from components.dashboard_blocks import render_blocks_for_pdf
+from components.velocity_map import build_dashboard_velocity_figure
+from constant import SCORING_RULES
+from services.diagnostics import detect_risks, extract_diagnostic_info, generate_score_table
+from services.render import render_png
 from io import BytesIO
 
+# Resolution of charts in compact reports, at the size they are placed on the page
+REPORT_IMAGE_DPI = 150
 
-class VelocityPDF(FPDF):
-    def __init__(self):
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def png_size(png_bytes: bytes) -> Tuple[int, int]:
+    """(width, height) in pixels, read from the IHDR chunk without decoding the image."""
+    if png_bytes[:8] != PNG_SIGNATURE or png_bytes[12:16] != b"IHDR":
+        raise ValueError("Chart image is not a PNG.")
+    return struct.unpack(">II", png_bytes[16:24])
+
+
+def compact_png(png_bytes: bytes, width_mm: float, dpi: int = REPORT_IMAGE_DPI, recompress: bool = True) -> bytes:
+    """Downsample to `dpi` at the placed width; `recompress` stores the chart as an optimized 256-colour PNG."""
+    width, height = png_size(png_bytes)
+    target = max(1, round(width_mm / 25.4 * dpi))
+    if target >= width and not recompress:
+        return png_bytes
+
+    img = Image.open(BytesIO(png_bytes))
+    if target < width:
+        img = img.resize((target, max(1, round(height * target / width))), Image.LANCZOS)
+    if recompress:
+        # Charts are flat colours and text; a palette keeps them sharp at a fraction of the size
+        img = img.convert("RGB").quantize(256, dither=Image.Dither.NONE)
+    out = BytesIO()
+    img.save(out, format="PNG", optimize=True)
+    return out.getvalue() if out.tell() < len(png_bytes) else png_bytes
+
+
+class ReportPDF(FPDF):
+    """FPDF that places PNG bytes straight from memory.
+
+    fpdf2 embeds byte-identical images once; in compact mode every image is downsampled (and
+    recompressed) once per size, so repeated charts still share one embedded copy.
+    """
+
+    def __init__(self, compact: bool = False, dpi: int = REPORT_IMAGE_DPI, recompress: bool = True):
         super().__init__()
+        self.compact = compact
+        self.dpi = dpi
+        self.recompress = recompress
+        self._compacted = {}
+
+    def add_png(self, png_bytes: bytes, x: float, y: float, w: float, h: float = 0):
+        if self.compact:
+            key = (hashlib.sha1(png_bytes).digest(), round(w, 1))
+            if key not in self._compacted:
+                self._compacted[key] = compact_png(png_bytes, w, self.dpi, self.recompress)
+            png_bytes = self._compacted[key]
+        self.image(BytesIO(png_bytes), x=x, y=y, w=w, h=h)
+
+
+class VelocityPDF(ReportPDF):
+    def __init__(self, compact: bool = False, dpi: int = REPORT_IMAGE_DPI, recompress: bool = True):
+        super().__init__(compact, dpi, recompress)
         self.section_spacing = 8
         self.line_height = 6
         self.title_height = 12
@@ -39,12 +95,7 @@ class VelocityPDF(FPDF):
         self.ln(5)
 
     def add_velocity_map(self, image_bytes: bytes):
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmp_file:
-            tmp_file.write(image_bytes)
-            tmp_file_path = tmp_file.name
-
-        img = Image.open(tmp_file_path)
-        img_width, img_height = img.size
+        img_width, img_height = png_size(image_bytes)
         aspect_ratio = img_height / img_width
 
         display_width = (self.w - 2 * self.l_margin) * 0.8
@@ -55,7 +106,7 @@ class VelocityPDF(FPDF):
         x_offset = (self.w - display_width) / 2
         current_y = self.get_y()
 
-        self.image(tmp_file_path, x=x_offset, y=current_y, w=display_width, h=display_height)
+        self.add_png(image_bytes, x=x_offset, y=current_y, w=display_width, h=display_height)
         self.set_y(current_y + display_height + self.section_spacing)
 
     def add_score_table(self, df: pd.DataFrame):
@@ -100,17 +151,10 @@ class VelocityPDF(FPDF):
 
         self.ln(self.section_spacing)
 
-    def add_all_blocks_to_pdf(self, df):
+    def add_all_blocks_to_pdf(self, df, rules=None):
         page_width = self.w - 2 * self.l_margin
 
-        for i, (module, metrics) in enumerate(ALL_METRIC_CLUSTERS.items()):
-            title, png_bytes, diags = render_block_for_pdf(
-                df,
-                DASHBOARD_TITLES[module],
-                metrics,
-                chart_type=DEFAULT_CHART_TYPES.get(module, "line"),
-            )
-
+        for i, (title, png_bytes, diags) in enumerate(render_blocks_for_pdf(df, rules=rules)):
             if i > 0 and self.remaining_height < 60:
                 self.add_page()
 
@@ -118,9 +162,7 @@ class VelocityPDF(FPDF):
             self.cell(0, self.title_height, title, ln=True)
 
             if png_bytes:
-                img_stream = BytesIO(png_bytes)
-                img = Image.open(img_stream)
-                img_width, img_height = img.size
+                img_width, img_height = png_size(png_bytes)
 
                 aspect_ratio = img_height / img_width
                 display_width = page_width * 0.9
@@ -136,8 +178,8 @@ class VelocityPDF(FPDF):
                 x_offset = self.l_margin + (page_width - display_width) / 2
                 current_y = self.get_y()
 
-                self.image(img_stream, x=x_offset, y=current_y,
-                          w=display_width, h=display_height)
+                self.add_png(png_bytes, x=x_offset, y=current_y,
+                             w=display_width, h=display_height)
                 self.set_y(current_y + display_height + 5)
 
             if diags:
@@ -213,61 +255,35 @@ def build_full_pdf(
     trend: str,
     composite_score: float,
     risks: List[str],
-    df: pd.DataFrame
+    df: pd.DataFrame,
+    compact: bool = False,
+    rules: dict = None
 ) -> bytes:
-    pdf = VelocityPDF()
+    pdf = VelocityPDF(compact=compact)
     pdf.add_page()
 
     pdf.add_velocity_map(png_bytes)
     pdf.add_diagnosis(quadrant, trend, composite_score, risks)
     pdf.add_score_table(score_df)
-    pdf.add_all_blocks_to_pdf(df)
+    pdf.add_all_blocks_to_pdf(df, rules)
 
     return bytes(pdf.output(dest="S"))
 
 
-def png_to_pdf_bytes(png_bytes: bytes, title: str) -> bytes:
-    pdf = FPDF()
+def png_to_pdf_bytes(png_bytes: bytes, title: str, compact: bool = False) -> bytes:
+    pdf = ReportPDF(compact=compact)
     pdf.add_page()
     pdf.set_font("Helvetica", size=14)
     pdf.cell(200, 10, txt=title, ln=True, align="C")
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmp_file:
-        tmp_file.write(png_bytes)
-        tmp_file_path = tmp_file.name
-
-    pdf.image(tmp_file_path, x=10, y=30, w=180)
+    pdf.add_png(png_bytes, x=10, y=30, w=180)
     return bytes(pdf.output(dest="S"))
 
-def generate_score_table(df_scored, scoring_rules):
-    return pd.DataFrame([
-        {
-            "Metric": m,
-            "Raw": f"{df_scored[m].iloc[-1]:.2f}" if m in df_scored else "N/A",
-            "Weight": f"{df_scored[f'W_{m}'].iloc[-1]:.0f}%" if f"W_{m}" in df_scored else "N/A",
-            "Score": f"{df_scored[f'S_{m}'].iloc[-1]:.0f}" if f"S_{m}" in df_scored else "N/A"
-        }
-        for m in scoring_rules
-    ])
-
-def extract_diagnostic_info(df_scored):
-    quadrant = df_scored["Quadrant"].iloc[-1] if "Quadrant" in df_scored else "Unknown"
-    trend = df_scored["VelocityTrend"].iloc[-1] if "VelocityTrend" in df_scored else "Flat"
-    composite_score = df_scored["CompositeScore"].iloc[-1] if "CompositeScore" in df_scored else 0
-    return quadrant, trend, composite_score
-
-def detect_risks(df_scored):
-    risks = []
-    latest = df_scored.iloc[-1]
-
-    if "BurnRate_kUSD" in latest and "RevenueGrowRate" in latest:
-        if latest["BurnRate_kUSD"] > latest["RevenueGrowRate"] * 10:
-            risks.append("Burn rate significantly exceeds revenue growth")
-
-    if "ChurnRate_%" in latest and latest["ChurnRate_%"] > 20:
-        risks.append("Churn rate exceeds 20%")
-
-    if "CustomerRetentionRate_%" in latest and latest["CustomerRetentionRate_%"] < 50:
-        risks.append("Customer retention below 50%")
-
-    return risks
\ No newline at end of file
+def build_company_report(df_scored: pd.DataFrame, df: pd.DataFrame, score_threshold: float, age_threshold: int,
+                         milestone_config: dict, compact: bool = False, rules: dict = None) -> bytes:
+    """Full diagnostic PDF of one company, as the "Generate PDF Report" button builds it; `rules` are the
+    active profile's thresholds for the block warnings."""
+    fig = build_dashboard_velocity_figure(df_scored, score_threshold, age_threshold, milestone_config)
+    quadrant, trend, composite_score = extract_diagnostic_info(df_scored)
+    return build_full_pdf(render_png(fig), generate_score_table(df_scored, SCORING_RULES), quadrant, trend,
+                          composite_score, detect_risks(df_scored), df, compact, rules)
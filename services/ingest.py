@@ -0,0 +1,126 @@
+# services/ingest.py
+
+import os
+from collections import Counter
+
+import pandas as pd
+
+from constant import COMPANY_COL, SCORING_RULES
+from services.utils import clean_notices, clean_rows, order_rows
+
+CSV_CHUNK_ROWS = 250_000
+
+# Uploads at least this large are streamed; smaller files keep every column for the dashboard blocks
+STREAM_CSV_MIN_BYTES = 50 * 1024 ** 2
+
+
+def ingest_columns():
+    return ["Month", COMPANY_COL] + list(SCORING_RULES)
+
+
+def stream_csv(source, chunksize: int = CSV_CHUNK_ROWS):
+    """Read a CSV chunk by chunk, keeping only Month, the company id and the SCORING_RULES columns.
+
+    Each chunk is cleaned on its own; ordering and Month_Index run once on the combined frame.
+    Returns (df, notices) like clean_frame. The raw text of the file is never held in full.
+    """
+    wanted = set(ingest_columns())
+    parts = []
+    invalid_count = 0
+    rescued = Counter()
+
+    # Key columns are read as text (months are parsed by parse_month_column); metric columns are left
+    # to the C parser so formatted values still reach normalize_numeric
+    reader = pd.read_csv(source, usecols=lambda c: c in wanted, dtype={"Month": str, COMPANY_COL: str},
+                         chunksize=chunksize)
+    for chunk in reader:
+        chunk, invalid, chunk_rescued = clean_rows(chunk)
+        invalid_count += invalid
+        rescued.update(chunk_rescued)
+        parts.append(chunk)
+
+    if not parts:
+        raise ValueError("The CSV file has no rows.")
+
+    companies = None
+    if COMPANY_COL in parts[0].columns:
+        company_loc = parts[0].columns.get_loc(COMPANY_COL)
+        # Per-chunk categoricals share one set of company strings instead of one string per row
+        companies = pd.api.types.union_categoricals(
+            [pd.Categorical(part.pop(COMPANY_COL)) for part in parts]
+        ).astype(object)
+    df = pd.concat(parts, ignore_index=True)
+    parts.clear()
+    if companies is not None:
+        df.insert(company_loc, COMPANY_COL, companies)
+
+    df = order_rows(df)
+    notices = clean_notices(invalid_count, dict(rescued))
+    # Lets the pipeline's clean stage pass the frame through instead of cleaning it again
+    df.attrs["clean_notices"] = notices
+    return df, notices
+
+
+COLUMNAR_FORMATS = {"parquet": "parquet", "pq": "parquet", "feather": "ipc", "arrow": "ipc", "ipc": "ipc"}
+
+
+def _arrow_source(source):
+    import pyarrow as pa
+
+    if isinstance(source, (str, os.PathLike)):
+        return pa.memory_map(os.fspath(source), "r")
+    # Uploads are already in memory; BufferReader reads them without another copy
+    return pa.BufferReader(source.getvalue() if hasattr(source, "getvalue") else source.read())
+
+
+def _month_filter(field_type, month_range):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    lo, hi = month_range
+    month = pc.field("Month")
+    if pa.types.is_integer(field_type):
+        return (month >= lo) & (month <= hi)
+    if pa.types.is_date(field_type) or (pa.types.is_timestamp(field_type) and field_type.tz is None):
+        start = pd.Timestamp(year=lo // 100, month=lo % 100, day=1)
+        end = pd.Timestamp(year=hi // 100, month=hi % 100, day=1) + pd.offsets.MonthBegin(1)
+        if pa.types.is_date(field_type):
+            start, end = start.date(), end.date()
+        return (month >= pa.scalar(start, type=field_type)) & (month < pa.scalar(end, type=field_type))
+    # Text months are parsed later by clean_frame; they cannot be compared here
+    return None
+
+
+def read_columnar(source, fmt: str, month_range=None) -> pd.DataFrame:
+    """Read Parquet or Arrow IPC/Feather with only Month, the company id and the SCORING_RULES columns.
+
+    Paths are memory-mapped. With `month_range` (YYYYMM, inclusive) and an integer or date Month
+    column, rows outside the range are dropped by the reader (Parquet row groups are skipped).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    source = _arrow_source(source)
+    if COLUMNAR_FORMATS[fmt] == "parquet":
+        schema = pq.read_schema(source)
+        source.seek(0)
+    else:
+        try:
+            reader = pa.ipc.open_file(source)
+        except pa.ArrowInvalid:
+            source.seek(0)
+            reader = pa.ipc.open_stream(source)
+        schema = reader.schema
+
+    columns = [c for c in ingest_columns() if c in schema.names]
+    month_filter = None
+    if month_range and "Month" in columns:
+        month_filter = _month_filter(schema.field("Month").type, month_range)
+
+    if COLUMNAR_FORMATS[fmt] == "parquet":
+        table = pq.read_table(source, columns=columns, filters=month_filter)
+    else:
+        table = reader.read_all().select(columns)
+        if month_filter is not None:
+            table = table.filter(month_filter)
+    return table.to_pandas()
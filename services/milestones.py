@@ -0,0 +1,87 @@
+# services/milestones.py
+
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+MILESTONE_OPS = {
+    ">=": np.greater_equal,
+    "<=": np.less_equal,
+}
+
+
+def milestone_conditions(milestone_config) -> List[dict]:
+    # Single-condition configs ({"field", "op", "threshold"}) are the one-element case
+    conditions = milestone_config.get("conditions")
+    if not conditions:
+        conditions = [{k: milestone_config.get(k) for k in ("field", "op", "threshold")}]
+    return conditions
+
+
+def describe_milestone(milestone_config) -> str:
+    if not milestone_config or not milestone_config.get("enabled"):
+        return ""
+    joiner = " OR " if milestone_config.get("logic") == "or" else " AND "
+    text = joiner.join(
+        f"{c['field']} {c['op']} {float(c['threshold']):.2f}" for c in milestone_conditions(milestone_config)
+    )
+    sustain = int(milestone_config.get("sustain") or 1)
+    return text + (f" for {sustain} months" if sustain > 1 else "")
+
+
+def milestone_hits(df: pd.DataFrame, milestone_config) -> np.ndarray:
+    """Rows meeting the milestone condition(s) that month; a missing field or value never meets it."""
+    masks = []
+    for c in milestone_conditions(milestone_config):
+        if c.get("op") not in MILESTONE_OPS:
+            raise ValueError("Unsupported milestone operator")
+        if c.get("field") not in df.columns:
+            masks.append(np.zeros(len(df), dtype=bool))
+            continue
+        values = pd.to_numeric(df[c["field"]], errors="coerce").to_numpy(dtype=float)
+        with np.errstate(invalid="ignore"):
+            masks.append(MILESTONE_OPS[c["op"]](values, float(c["threshold"])))
+    combine = np.logical_or if milestone_config.get("logic") == "or" else np.logical_and
+    return combine.reduce(masks) if masks else np.zeros(len(df), dtype=bool)
+
+
+def milestone_maturity(df: pd.DataFrame, milestone_config, groups: pd.Series, prior_run=None, prior_mature=None):
+    """Per-company milestone maturity; returns (is_mature, run) as arrays aligned with `df`.
+
+    `run` counts consecutive months meeting the condition(s), so "sustained for k months" is hit when
+    run >= k. A company is mature from its first hit onwards (cumulative max). `prior_run` and
+    `prior_mature` (per row, from an already scored history) carry both across an append.
+    """
+    hits = milestone_hits(df, milestone_config)
+    sustain = max(1, int(milestone_config.get("sustain") or 1))
+
+    # Streaks are counted over each company's rows in order; sort only if companies are interleaved
+    codes = pd.factorize(groups.to_numpy(), use_na_sentinel=False)[0]
+    order = None if np.all(np.diff(codes) >= 0) else np.argsort(codes, kind="stable")
+    if order is not None:
+        hits, codes = hits[order], codes[order]
+        if prior_run is not None:
+            prior_run = np.asarray(prior_run)[order]
+
+    n = len(hits)
+    pos = np.arange(n)
+    starts = np.ones(n, dtype=bool)
+    starts[1:] = codes[1:] != codes[:-1]
+    # Last position that breaks a streak; each company's first row is preceded by a virtual break
+    start_break = np.maximum.accumulate(np.where(starts, pos - 1, -1))
+    last_break = np.maximum.accumulate(np.maximum(np.where(~hits, pos, -1), start_break))
+    run = pos - last_break
+    if prior_run is not None:
+        run = run + np.where(last_break == start_break, np.asarray(prior_run, dtype=int), 0)
+
+    if order is not None:
+        restored = np.empty_like(run)
+        restored[order] = run
+        run = restored
+
+    sustained = pd.Series(run >= sustain, index=df.index)
+    is_mature = sustained.groupby(groups, sort=False, dropna=False).cummax().to_numpy(dtype=bool)
+    if prior_mature is not None:
+        is_mature |= np.asarray(prior_mature, dtype=bool)
+    return is_mature, run
@@ -0,0 +1,60 @@
+# services/normalize.py
+
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+SUFFIX_SCALE = {"k": 1e3, "m": 1e6, "mm": 1e6, "mn": 1e6, "b": 1e9, "bn": 1e9}
+
+_NUMBER = r"^(?P<neg>-)?(?P<num>[\d.,']+)(?P<suffix>k|mm|mn|m|bn|b)?$"
+
+
+def _locale_to_plain(num: pd.Series) -> pd.Series:
+    """'1,234.5' / '1.234,5' / "1'234" / '12,5' -> '1234.5' / '1234.5' / '1234' / '12.5'."""
+    num = num.str.replace("'", "", regex=False)
+    last_comma = num.str.rfind(",")
+    last_dot = num.str.rfind(".")
+    comma_decimal = (last_comma > last_dot) & ~num.str.fullmatch(r"\d{1,3}(,\d{3})+")
+    dot_grouping = (last_comma < 0) & num.str.fullmatch(r"\d{1,3}(\.\d{3}){2,}")
+
+    plain = num.str.replace(",", "", regex=False)
+    swapped = num.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+    plain = plain.mask(comma_decimal, swapped)
+    return plain.mask(dot_grouping, num.str.replace(".", "", regex=False))
+
+
+def normalize_numeric(values: pd.Series, unit_scale: float = 1.0) -> Tuple[pd.Series, int]:
+    """Convert a column to float, reading formatted strings pd.to_numeric would turn into NaN.
+
+    Handles currency symbols, percent signs, thousands separators (either locale), accounting
+    negatives "(3.2)" and k/M/bn suffixes. Suffixed amounts are divided by `unit_scale`, so "$45k"
+    lands as 45 in a kUSD column. Each distinct value is converted once. Returns the values and the
+    number of cells that plain pd.to_numeric would have lost.
+    """
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return values.astype(float), 0
+
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(uniques, dtype=object)
+    parsed = pd.to_numeric(uniques, errors="coerce").to_numpy(dtype=float)
+    lost = np.isnan(parsed)
+
+    failed = np.flatnonzero(lost)
+    if len(failed):
+        text = uniques.iloc[failed].astype(str).str.strip().str.lower()
+        text = text.str.replace(r"\s+", "", regex=True).str.replace("\u2212", "-", regex=False)
+        accounting = text.str.fullmatch(r"\(.*\)")
+        text = text.mask(accounting, text.str.slice(1, -1))
+        text = text.str.replace(r"^(usd|eur|gbp|chf)|(usd|eur|gbp|chf)$|[$€£¥₹%]", "", regex=True)
+
+        parts = text.str.extract(_NUMBER)
+        ok = parts["num"].notna() & parts["num"].str.contains(r"\d", regex=True)
+        number = pd.to_numeric(_locale_to_plain(parts["num"].where(ok, "")), errors="coerce")
+        scale = parts["suffix"].map(SUFFIX_SCALE).fillna(unit_scale).to_numpy(dtype=float) / unit_scale
+        sign = np.where(parts["neg"].notna().to_numpy() ^ accounting.to_numpy(dtype=bool), -1.0, 1.0)
+        parsed[failed] = np.where(ok.to_numpy(), number.to_numpy(dtype=float) * scale * sign, np.nan)
+
+    result = np.append(parsed, np.nan)[codes]
+    rescued = int(np.count_nonzero(np.append(lost & ~np.isnan(parsed), False)[codes]))
+    return pd.Series(result, index=values.index), rescued
@@ -0,0 +1,89 @@
+# services/pdf_cache.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+from contextlib import closing, contextmanager
+from typing import List
+
+from constant import PDF_CACHE_DIR, PDF_CACHE_MAX_MB
+from services.pdf_tables import PDF_PARSER_VERSION, PageTable, extract_page_tables
+
+
+class PdfTableCache:
+    """Per-page tables of parsed PDFs in a SQLite file, keyed by SHA-256 of the bytes and the parser version.
+
+    Entries are zlib-compressed JSON; once the stored total exceeds `max_bytes`, the least recently
+    used entries are evicted.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.path = os.path.join(directory, "tables.sqlite")
+        self.max_bytes = max_bytes
+        self._ready = False
+
+    @contextmanager
+    def _connect(self):
+        # The directory and table are created on first use, not at import
+        if not self._ready:
+            os.makedirs(self.directory, exist_ok=True)
+            with closing(sqlite3.connect(self.path, timeout=30)) as con, con:
+                con.execute("PRAGMA journal_mode=WAL")
+                con.execute(
+                    "CREATE TABLE IF NOT EXISTS pages ("
+                    "key TEXT PRIMARY KEY, payload BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+                )
+            self._ready = True
+        with closing(sqlite3.connect(self.path, timeout=30)) as con, con:
+            yield con
+
+    @staticmethod
+    def key(data: bytes) -> str:
+        return f"{hashlib.sha256(data).hexdigest()}:v{PDF_PARSER_VERSION}"
+
+    def get(self, key: str):
+        with self._connect() as con:
+            row = con.execute("SELECT payload FROM pages WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            con.execute("UPDATE pages SET last_used = ? WHERE key = ?", (time.time(), key))
+        return [tuple(page) if page else None for page in json.loads(zlib.decompress(row[0]))]
+
+    def put(self, key: str, pages: List[PageTable]):
+        payload = zlib.compress(json.dumps(pages).encode())
+        if len(payload) > self.max_bytes:
+            return
+        with self._connect() as con:
+            con.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)", (key, payload, len(payload), time.time()))
+            self._evict(con)
+
+    def _evict(self, con):
+        total = 0
+        stale = []
+        for key, size in con.execute("SELECT key, size FROM pages ORDER BY last_used DESC"):
+            total += size
+            if total > self.max_bytes:
+                stale.append((key,))
+        con.executemany("DELETE FROM pages WHERE key = ?", stale)
+
+    def stats(self) -> dict:
+        with self._connect() as con:
+            entries, size = con.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+        return {"entries": entries, "used_mb": size / 1024 ** 2, "max_mb": self.max_bytes / 1024 ** 2}
+
+
+PDF_CACHE = PdfTableCache(PDF_CACHE_DIR, PDF_CACHE_MAX_MB * 1024 ** 2)
+
+
+def cached_page_tables(data: bytes, force: bool = False) -> List[PageTable]:
+    """extract_page_tables() through the disk cache; `force` re-parses and overwrites the cached entry."""
+    key = PDF_CACHE.key(data)
+    pages = None if force else PDF_CACHE.get(key)
+    if pages is None:
+        pages = extract_page_tables(data)
+        PDF_CACHE.put(key, pages)
+    return pages
@@ -0,0 +1,82 @@
+# services/pdf_tables.py
+
+import io
+from typing import List, Optional, Tuple
+
+import pandas as pd
+import pdfplumber
+
+from services.workers import pool_workers, process_pool, split_evenly
+
+# Bump when page extraction or header detection changes; invalidates the on-disk table cache
+PDF_PARSER_VERSION = 1
+
+# Below this many pages the process pool's startup and the copies of the PDF bytes cost more than they save
+PDF_PARALLEL_MIN_PAGES = 16
+
+PageTable = Optional[Tuple[List[str], List[list]]]
+
+
+def _page_table(page) -> PageTable:
+    """(header, body rows) of all tables on a page; None when the page has no usable table."""
+    rows = []
+    for table in page.extract_tables():
+        if table and any(any(cell for cell in row) for row in table):
+            rows.extend(table)
+
+    for i, potential_header in enumerate(rows):
+        if any(cell and cell.strip() for cell in potential_header):
+            header = [h.strip().replace("\u200b", "") if h else "" for h in potential_header]
+            return header, rows[i + 1:]
+    return None
+
+
+def _extract_page_range(data: bytes, start: int, stop: int) -> List[PageTable]:
+    with pdfplumber.open(io.BytesIO(data)) as pdf:
+        return [_page_table(pdf.pages[i]) for i in range(start, stop)]
+
+
+def extract_page_tables(data: bytes, workers: int = None) -> List[PageTable]:
+    """Run table extraction once per page; large documents are split into page ranges across processes."""
+    with pdfplumber.open(io.BytesIO(data)) as pdf:
+        n_pages = len(pdf.pages)
+        pool_size = pool_workers(workers)
+        workers = min(pool_size, n_pages)
+        if n_pages < PDF_PARALLEL_MIN_PAGES or workers < 2:
+            return [_page_table(page) for page in pdf.pages]
+
+    futures = [process_pool(pool_size).submit(_extract_page_range, data, start, stop)
+               for start, stop in split_evenly(n_pages, workers)]
+    return [page for future in futures for page in future.result()]
+
+
+def merge_page_tables(pages: List[PageTable]) -> pd.DataFrame:
+    """Stack pages into one frame in a single pass.
+
+    Consecutive pages with the same header are appended below each other; a page with a new header is
+    placed next to everything read so far (rows aligned by position), as separate column blocks.
+    """
+    runs = []
+    for page in pages:
+        if page is None:
+            continue
+        header, rows = page
+        frame = pd.DataFrame(rows, columns=header)
+        frame = frame.loc[:, ~frame.columns.str.contains("^Unnamed")]
+        if runs and header == runs[-1][0]:
+            runs[-1][1].append(frame)
+        else:
+            runs.append((header, [frame]))
+
+    df = pd.DataFrame()
+    for _, frames in runs:
+        first, rest = frames[0], frames[1:]
+        if df.empty:
+            df = first
+        else:
+            max_len = max(len(df), len(first))
+            df = pd.concat([df.reindex(range(max_len)).reset_index(drop=True),
+                            first.reindex(range(max_len)).reset_index(drop=True)], axis=1)
+        if rest:
+            df = pd.concat([df, *rest], ignore_index=True)
+    return df
@@ -0,0 +1,167 @@
+# services/pipeline.py
+
+from typing import Callable, Dict, Iterable, NamedTuple, Tuple
+
+import pandas as pd
+
+from components.velocity_map import build_dashboard_velocity_figure
+from constant import COMPANY_COL, SCORING_RULES
+from services.cache import RESULT_CACHE, content_key, frame_digest
+from services.evaluation import classify
+from services.scoring import build_customdata, compute_scores_incremental
+from services.uncertainty import bootstrap_scores
+from services.utils import clean_frame, filter_months
+
+
+class Stage(NamedTuple):
+    fn: Callable
+    inputs: Tuple[str, ...]
+    shared: bool
+    incremental: bool
+
+
+def value_key(value) -> str:
+    if isinstance(value, pd.DataFrame):
+        return frame_digest(value)
+    if hasattr(value, "fingerprint"):
+        return content_key(type(value).__name__, value.fingerprint)
+    return content_key(value)
+
+
+class Pipeline:
+    """Named stages that declare their inputs (run parameters or other stages).
+
+    A stage's key hashes its name and the keys of its inputs, so a changed parameter invalidates
+    exactly the stages downstream of it. The last (key, result) of every stage is kept in a
+    caller-owned `memo` dict (one per session); `shared` stages are also looked up in the
+    process-wide RESULT_CACHE. `incremental` stages get their previous result as `prev=`.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Stage] = {}
+
+    def add(self, name: str, fn: Callable, inputs: Iterable[str] = (), shared=False, incremental=False):
+        self.stages[name] = Stage(fn, tuple(inputs), shared, incremental)
+
+    def stage(self, name: str, inputs: Iterable[str] = (), shared=False, incremental=False):
+        def register(fn):
+            self.add(name, fn, inputs, shared, incremental)
+            return fn
+        return register
+
+    def run(self, targets, params: dict, memo: dict, keys: dict = None):
+        """Compute `targets` (a stage name or list of names); returns the result or a dict of results.
+
+        `keys` overrides the content key of a parameter (e.g. an upload hash for the raw frame).
+        Names of recomputed stages are appended to memo["__recomputed__"] (reset it once per rerun).
+        """
+        keys = keys or {}
+        resolved = {}
+        recomputed = []
+
+        def resolve(name):
+            if name in resolved:
+                return resolved[name]
+            if name in params:
+                key = keys.get(name) or value_key(params[name])
+                resolved[name] = (key, params[name])
+                return resolved[name]
+            if name not in self.stages:
+                raise ValueError(f"Unknown pipeline stage or parameter: {name}")
+
+            stage = self.stages[name]
+            deps = [resolve(i) for i in stage.inputs]
+            key = content_key("stage", name, [k for k, _ in deps])
+            last = memo.get(name)
+            if last is not None and last[0] == key:
+                value = last[1]
+            else:
+                args = [v for _, v in deps]
+                extra = {"prev": last[1] if last is not None else None} if stage.incremental else {}
+
+                def compute():
+                    return stage.fn(*args, **extra)
+
+                value = RESULT_CACHE.get_or_compute(key, compute) if stage.shared else compute()
+                memo[name] = (key, value)
+                recomputed.append(name)
+            resolved[name] = (key, value)
+            return resolved[name]
+
+        if isinstance(targets, str):
+            result = resolve(targets)[1]
+        else:
+            result = {t: resolve(t)[1] for t in targets}
+        memo.setdefault("__recomputed__", []).extend(recomputed)
+        return result
+
+
+# Data stages of the dashboard; app.py adds the figure stages and supplies the widget values as parameters
+DASHBOARD = Pipeline()
+
+
+@DASHBOARD.stage("cleaned", inputs=["raw"], shared=True)
+def _cleaned(raw):
+    if "clean_notices" in raw.attrs:
+        return raw, raw.attrs["clean_notices"]
+    return clean_frame(raw)
+
+
+@DASHBOARD.stage("frame", inputs=["cleaned", "snap_range"])
+def _snapshot(cleaned, snap_range):
+    return filter_months(cleaned[0], snap_range)
+
+
+@DASHBOARD.stage("scores", inputs=["frame", "norm_weights", "model"], shared=True, incremental=True)
+def _scores(frame, norm_weights, model, prev=None):
+    # Weight-dependent columns only, so stage/threshold changes never rescore
+    return compute_scores_incremental(frame, norm_weights, None, None, None, prev=prev, model=model,
+                                      classify_rows=False)
+
+
+@DASHBOARD.stage("classified", inputs=["scores", "age_threshold", "score_threshold", "milestone_config"])
+def _classified(scores, age_threshold, score_threshold, milestone_config):
+    return classify(scores["scored"], age_threshold, score_threshold, milestone_config)
+
+
+@DASHBOARD.stage("bands", inputs=["classified", "norm_weights", "score_threshold", "n_boot", "model"], shared=True)
+def _bands(classified, norm_weights, score_threshold, n_boot, model):
+    if not n_boot:
+        return None
+    return bootstrap_scores(classified, norm_weights, score_threshold, n_boot=n_boot, model=model)
+
+
+@DASHBOARD.stage("scored", inputs=["classified", "bands"])
+def _scored(classified, bands):
+    if bands is None:
+        return classified
+    return pd.concat([classified.drop(columns=bands.columns, errors="ignore"), bands], axis=1)
+
+
+def _company_view(df, company):
+    if company is None:
+        return df
+    return df.loc[df[COMPANY_COL] == company].reset_index(drop=True)
+
+
+DASHBOARD.add("frame_view", _company_view, inputs=["frame", "company"])
+DASHBOARD.add("view", _company_view, inputs=["scored", "company"])
+
+
+@DASHBOARD.stage("map_view", inputs=["view", "scored", "map_all", "map_range"])
+def _map_view(view, scored, map_all, map_range):
+    rows = scored if map_all else view
+    if map_range is not None:
+        rows = rows.loc[rows["Month"].between(*map_range)].reset_index(drop=True)
+    return rows
+
+
+@DASHBOARD.stage("customdata", inputs=["map_view"])
+def _customdata(map_view):
+    return build_customdata(map_view, list(SCORING_RULES))
+
+
+@DASHBOARD.stage("velocity_fig", inputs=["map_view", "customdata", "score_threshold", "age_threshold",
+                                         "milestone_config"])
+def _velocity_fig(map_view, customdata, score_threshold, age_threshold, milestone_config):
+    return build_dashboard_velocity_figure(map_view, score_threshold, age_threshold, milestone_config, customdata)
@@ -0,0 +1,42 @@
+# services/render.py
+
+from typing import List, Sequence
+
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from constant import PNG_CACHE_MAX_MB
+from services.cache import ResultCache, content_key
+from services.workers import pool_workers, process_pool
+
+PNG_CACHE = ResultCache(PNG_CACHE_MAX_MB * 1024 ** 2)
+
+
+def _render(spec: str, scale: float) -> bytes:
+    # Also runs inside pool workers, which keep their kaleido process alive between reports
+    return pio.to_image(pio.from_json(spec, skip_invalid=True), format="png", scale=scale)
+
+
+def render_pngs(figs: Sequence[go.Figure], scale: float = 1, workers: int = None) -> List[bytes]:
+    """PNG bytes of each figure, in order.
+
+    PNGs are cached by a hash of the figure JSON, so only figures whose spec changed are rendered;
+    those render concurrently on a pool of `workers` processes (default: one per CPU).
+    """
+    specs = [fig.to_json() for fig in figs]
+    keys = [content_key("png", spec, scale) for spec in specs]
+    pngs = [PNG_CACHE.get(key) for key in keys]
+    missing = {key: spec for key, spec, png in zip(keys, specs, pngs) if png is None}
+
+    pool_size = pool_workers(workers)
+    if min(pool_size, len(missing)) < 2:
+        compute = {key: (lambda spec=spec: _render(spec, scale)) for key, spec in missing.items()}
+    else:
+        pool = process_pool(pool_size)
+        compute = {key: pool.submit(_render, spec, scale).result for key, spec in missing.items()}
+    rendered = {key: PNG_CACHE.get_or_compute(key, fn) for key, fn in compute.items()}
+    return [rendered[key] if png is None else png for key, png in zip(keys, pngs)]
+
+
+def render_png(fig: go.Figure, scale: float = 1) -> bytes:
+    return render_pngs([fig], scale)[0]
@@ -1,30 +1,124 @@
 # services/scoring.py
 
+import hashlib
+import json
+
+import numpy as np
 import pandas as pd
 
-from services.evaluation import evaluate
+from services.scoring_model import load_profile
+from services.evaluation import evaluate, evaluate_with_state, evaluate_incremental, boundary_state
+from services.evaluation import company_groups, score_frame
+
+
+def compute_scores(df, norm_weights, age_threshold, score_threshold, milestone_config, model=None):
+    return evaluate(df, norm_weights, age_threshold, score_threshold, milestone_config, model)
+
+
+def normalize_weights(weights):
+    """Raw weights to shares summing to 1, as the sidebar sliders are read."""
+    total = sum(weights.values()) or 1
+    return {k: v / total for k, v in weights.items()}
+
+
+def scoring_fingerprint(norm_weights, age_threshold, score_threshold, milestone_config, model=None) -> str:
+    model = model or load_profile()
+    payload = json.dumps(
+        [norm_weights, age_threshold, score_threshold, milestone_config, model.fingerprint],
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def compute_scores_incremental(df, norm_weights, age_threshold, score_threshold, milestone_config, prev=None,
+                               model=None, classify_rows=True):
+    """Score `df`, reusing `prev` (the dict returned by the previous call) when months were only appended.
+
+    Rows dated after each company's last scored month are scored on their own; everything else is
+    taken from the previous result. History is treated as append-only: a full rescore happens when the
+    weights, thresholds, milestone or rule profile change, when earlier months were added or removed,
+    or when the last scored month of a company no longer matches.
+
+    With `classify_rows=False` only the weight-dependent columns are computed (see score_frame) and the
+    thresholds and milestone are ignored; classify() adds the rest.
+    """
+    if not classify_rows:
+        age_threshold = score_threshold = milestone_config = None
+    fingerprint = scoring_fingerprint(norm_weights, age_threshold, score_threshold, milestone_config, model)
+    metrics = [m for m in norm_weights if m in df.columns]
+
+    def _full():
+        if classify_rows:
+            scored, state = evaluate_with_state(df, norm_weights, age_threshold, score_threshold, milestone_config,
+                                                model)
+        else:
+            scored = score_frame(df, norm_weights, model)
+            state = boundary_state(scored)
+        return _result(fingerprint, scored, state, _boundary_rows(scored, metrics))
+
+    if prev is None or prev["fingerprint"] != fingerprint or "Month" not in df.columns or len(df) == 0:
+        return _full()
 
+    state, prev_scored = prev["state"], prev["scored"]
+    groups = company_groups(df)
+    last_month = groups.map(state["Month"])
+    is_new = (last_month.isna() | (df["Month"] > last_month)).to_numpy()
+    if (~is_new).sum() != len(prev_scored):
+        return _full()
 
-def compute_scores(df, norm_weights, age_threshold, score_threshold, milestone_config):
-    return evaluate(df, norm_weights, age_threshold, score_threshold, milestone_config)
+    # Each company's last scored row must still be there, unchanged
+    at_boundary = ~is_new & (df["Month"] == last_month).to_numpy()
+    boundary = df.loc[at_boundary, ["Month"] + metrics].set_index(groups[at_boundary].to_numpy()).sort_index()
+    if not boundary.index.equals(prev["boundary"].index) or not np.array_equal(
+            boundary.to_numpy(dtype=float), prev["boundary"].reindex(columns=boundary.columns).to_numpy(dtype=float),
+            equal_nan=True):
+        return _full()
+
+    if not is_new.any():
+        return prev
+
+    new_scored, state = evaluate_incremental(
+        state, df.loc[is_new], norm_weights, age_threshold, score_threshold, milestone_config, model, classify_rows
+    )
+    new_boundary = _boundary_rows(new_scored, metrics)
+    boundary = pd.concat([boundary.drop(index=new_boundary.index, errors="ignore"), new_boundary])
+
+    # Keep the row layout of `df`: slot the new rows in between the history rows
+    scored = pd.concat([prev_scored, new_scored], ignore_index=True)
+    scored.index = np.concatenate([np.flatnonzero(~is_new), np.flatnonzero(is_new)])
+    scored = scored.sort_index()
+    return _result(fingerprint, scored, state, boundary)
+
+
+def _boundary_rows(df, metrics):
+    groups = company_groups(df)
+    last = ~groups.duplicated(keep="last")
+    cols = (["Month"] if "Month" in df.columns else []) + metrics
+    return df.loc[last, cols].set_index(groups[last].to_numpy()).sort_index()
+
+
+def _result(fingerprint, scored, state, boundary):
+    return {"fingerprint": fingerprint, "scored": scored, "state": state, "boundary": boundary}
 
 
 def build_customdata(df_scored, metric_cols):
-    hover_cols = ["Quadrant", "CompositeScore", "LaggingMetric"]
+    """Hover payload as one float32 array: CompositeScore, then value / weight / score of each metric.
+
+    Missing values stay NaN. Quadrant and LaggingMetric are text and go on the trace's text / hovertext.
+    """
+    hover_cols = ["CompositeScore"]
 
     for m in metric_cols:
         hover_cols += [m, f"W_{m}", f"S_{m}"]
 
-    return df_scored[hover_cols].apply(
-        lambda r: [None if pd.isna(x) else x for x in r], axis=1
-    ).to_numpy()
+    return df_scored[hover_cols].to_numpy(dtype=np.float32, na_value=np.nan)
 
 
 def build_hovertemplate(metric_cols):
     lines = []
     for i, m in enumerate(metric_cols):
         lbl = m.replace("_%", "").replace("_kUSD", "")
-        base = 3 + i * 3
+        base = 1 + i * 3
         lines.append(
             f"{lbl}: "
             f"%{{customdata[{base}]:,.1f}} / "
@@ -33,11 +127,39 @@ def build_hovertemplate(metric_cols):
         )
     return (
         "<b>Month %{x}</b><br>"
-        "Composite %{customdata[1]:.1f}<br>"
-        "<b>Quadrant → %{customdata[0]}</b><br>"
-        "Lagging Metric: <b>%{customdata[2]}</b><br>"
+        "Composite %{customdata[0]:.1f}<br>"
+        "<b>Quadrant → %{text}</b><br>"
+        "Lagging Metric: <b>%{hovertext}</b><br>"
         "<b>Metric / W% / Score</b><br>" +
         "<br>".join(lines) + "<extra></extra>"
     )
 
 
+def hover_payload(customdata, hover_tmpl):
+    """(customdata, hovertemplate) for one marker trace, showing "n/a" for metrics with a missing value or score.
+
+    Without missing values both come back unchanged, so customdata still ships as a float32 typed array.
+    Otherwise customdata becomes a list of numbers rounded for display, blank where missing, plus one
+    "n/a"/"" column per metric that the single shared template prints next to value and score.
+    """
+    n_metrics = (customdata.shape[1] - 1) // 3
+    cells = customdata[:, 1:1 + 3 * n_metrics].reshape(len(customdata), n_metrics, 3)
+    missing = np.isnan(cells[:, :, 0]) | np.isnan(cells[:, :, 2])
+    if not missing.any():
+        return customdata, hover_tmpl
+
+    values = np.round(customdata.astype(np.float64), 3).astype(object)
+    values[np.isnan(customdata)] = ""
+    for i in range(n_metrics):
+        values[missing[:, i], 1 + 3 * i] = ""
+        values[missing[:, i], 3 + 3 * i] = ""
+    marks = np.where(missing, "n/a", "").astype(object)
+
+    marker_base = customdata.shape[1]
+    for i in range(n_metrics):
+        for col in (1 + 3 * i, 3 + 3 * i):
+            ref = f"%{{customdata[{col}]:,.1f}}"
+            hover_tmpl = hover_tmpl.replace(ref, ref + f"%{{customdata[{marker_base + i}]}}")
+    return np.hstack([values, marks]), hover_tmpl
+
+
@@ -0,0 +1,105 @@
+# services/scoring_model.py
+
+import hashlib
+import json
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import yaml
+
+from constant import SCORING_RULES
+
+PROFILE_DIR = Path(__file__).resolve().parent.parent / "profiles"
+DEFAULT_PROFILE = "default"
+
+
+class ScoringModel:
+    """Validated scoring rules compiled to arrays once; evaluate() reads thresholds from here."""
+
+    def __init__(self, name: str, rules: Dict[str, dict], version=1):
+        self.name = name
+        self.version = version
+        self.rules = {m: _validate_rule(m, r) for m, r in rules.items()}
+        self.metrics: Tuple[str, ...] = tuple(self.rules)
+        self._position = {m: j for j, m in enumerate(self.metrics)}
+
+        self.good = _frozen([r["good"] for r in self.rules.values()])
+        self.bad = _frozen([r["bad"] for r in self.rules.values()])
+        self.hib = _frozen([r["hib"] for r in self.rules.values()], dtype=bool)
+        denom = np.where(self.hib, self.good - self.bad, self.bad - self.good)
+        denom[denom == 0] = np.nan
+        self.denom = _frozen(denom)
+
+        payload = json.dumps([name, version, self.rules], sort_keys=True)
+        self.fingerprint = hashlib.sha1(payload.encode()).hexdigest()
+        self._arrays = {}
+
+    def __repr__(self):
+        return f"ScoringModel({self.name!r}, version={self.version!r}, metrics={len(self.metrics)})"
+
+    def arrays(self, metrics: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """(good, bad, hib, denom) lined up with `metrics`; metrics without a rule get a NaN denom."""
+        key = tuple(metrics)
+        if key not in self._arrays:
+            idx = np.array([self._position.get(m, -1) for m in key], dtype=int)
+            known = idx >= 0
+            self._arrays[key] = (
+                _frozen(np.where(known, self.good[idx], np.nan)),
+                _frozen(np.where(known, self.bad[idx], np.nan)),
+                _frozen(np.where(known, self.hib[idx], True), dtype=bool),
+                _frozen(np.where(known, self.denom[idx], np.nan)),
+            )
+        return self._arrays[key]
+
+    @classmethod
+    def from_yaml(cls, *paths):
+        """Build from one or more profile files; rules of later files override earlier ones."""
+        if not paths:
+            raise ValueError("At least one rule profile is required")
+        rules, name, version = {}, None, None
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as fh:
+                profile = yaml.safe_load(fh) or {}
+            if not isinstance(profile.get("rules"), dict):
+                raise ValueError(f"{path}: profile has no 'rules' mapping")
+            rules.update(profile["rules"])
+            name = profile.get("name", Path(path).stem)
+            version = profile.get("version", 1)
+        return cls(name, rules, version)
+
+
+def _validate_rule(metric, rule) -> dict:
+    if not isinstance(rule, dict) or not all(k in rule for k in ("good", "bad", "hib")):
+        raise ValueError(f"Rule for {metric} needs 'good', 'bad' and 'hib'")
+    try:
+        good, bad = float(rule["good"]), float(rule["bad"])
+    except (TypeError, ValueError):
+        raise ValueError(f"Rule for {metric}: 'good' and 'bad' must be numbers")
+    if not isinstance(rule["hib"], bool):
+        raise ValueError(f"Rule for {metric}: 'hib' must be true or false")
+    if good == bad:
+        raise ValueError(f"Rule for {metric}: 'good' and 'bad' must differ")
+    return {"good": good, "bad": bad, "hib": rule["hib"]}
+
+
+def _frozen(values, dtype=float) -> np.ndarray:
+    arr = np.array(values, dtype=dtype)
+    arr.setflags(write=False)
+    return arr
+
+
+def available_profiles() -> List[str]:
+    return [DEFAULT_PROFILE] + sorted(p.stem for p in PROFILE_DIR.glob("*.yaml") if p.stem != DEFAULT_PROFILE)
+
+
+@lru_cache(maxsize=None)
+def load_profile(name: str = DEFAULT_PROFILE) -> ScoringModel:
+    # The built-in profile mirrors constant.SCORING_RULES; the others live in profiles/<name>.yaml
+    if name == DEFAULT_PROFILE:
+        return ScoringModel(DEFAULT_PROFILE, SCORING_RULES)
+    path = PROFILE_DIR / f"{name}.yaml"
+    if not path.is_file():
+        raise ValueError(f"Unknown rule profile: {name}")
+    return ScoringModel.from_yaml(path)
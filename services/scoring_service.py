@@ -0,0 +1,416 @@
+# services/scoring_service.py
+
+import asyncio
+import io
+import json
+import logging
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+from constant import COMPANY_COL, SCORING_RULES
+from services.batch import run_config
+from services.diagnostics import detect_risks, extract_diagnostic_info, generate_score_table
+from services.evaluation import evaluate
+from services.normalize import normalize_numeric
+from services.scoring import scoring_fingerprint
+from services.utils import clean_notices, clean_rows, order_rows
+from services.workers import pool_workers, process_pool
+
+logger = logging.getLogger(__name__)
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+JSON = "application/json"
+OPERATIONS = ("evaluate", "risks", "score-table")
+
+# Requests with the same settings that arrive within this window are scored together
+BATCH_WINDOW_S = 0.005
+BATCH_MAX_ROWS = 50_000
+MAX_BODY_BYTES = 64 * 1024 * 1024
+MAX_HEADERS = 100
+
+_BATCH_COL = "_batch_request"
+_COMPANY_KEY = "_batch_company"
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _company_frames(scored: pd.DataFrame):
+    if COMPANY_COL not in scored.columns:
+        return [(None, scored)]
+    return list(scored.groupby(COMPANY_COL, sort=False, dropna=False))
+
+
+def _risk_frame(scored: pd.DataFrame) -> pd.DataFrame:
+    rows = []
+    for company, df_c in _company_frames(scored):
+        quadrant, trend, composite_score = extract_diagnostic_info(df_c)
+        rows.append({COMPANY_COL: company, "Quadrant": quadrant, "Trend": trend,
+                     "CompositeScore": float(composite_score), "Risks": detect_risks(df_c)})
+    return pd.DataFrame(rows, columns=[COMPANY_COL, "Quadrant", "Trend", "CompositeScore", "Risks"])
+
+
+def _score_table_frame(scored: pd.DataFrame) -> pd.DataFrame:
+    tables = []
+    for company, df_c in _company_frames(scored):
+        table = generate_score_table(df_c, SCORING_RULES)
+        table.insert(0, COMPANY_COL, company)
+        tables.append(table)
+    return pd.concat(tables, ignore_index=True)
+
+
+def _encode(df: pd.DataFrame, warnings, fmt: str):
+    """(content type, body, extra headers) for a result frame."""
+    if fmt == ARROW_STREAM:
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return ARROW_STREAM, sink.getvalue(), {"X-Scoring-Warnings": json.dumps(warnings)}
+
+    rows = df.to_json(orient="records", date_format="iso", default_handler=str)
+    return JSON, b'{"rows":' + rows.encode() + b',"warnings":' + json.dumps(warnings).encode() + b"}", {}
+
+
+def _respond(operation: str, scored: pd.DataFrame, warnings, fmt: str):
+    if operation == "risks":
+        return _encode(_risk_frame(scored), warnings, fmt)
+    if operation == "score-table":
+        return _encode(_score_table_frame(scored), warnings, fmt)
+    return _encode(scored, warnings, fmt)
+
+
+def _batch_notices(raw: pd.DataFrame, df: pd.DataFrame, n_jobs: int):
+    """clean_notices() for every request of a batch cleaned as one frame."""
+    batch = raw[_BATCH_COL].to_numpy()
+    invalid = np.bincount(batch, minlength=n_jobs) - np.bincount(batch[df.index], minlength=n_jobs)
+    dropped = raw.index.difference(df.index)
+
+    rescued = {}
+    for col in SCORING_RULES:
+        if col == "Month" or pd.api.types.is_numeric_dtype(raw[col]):
+            continue
+        # Cells plain pd.to_numeric would have lost but cleaning read, rows with invalid months included
+        read = np.zeros(len(raw), dtype=bool)
+        read[df.index] = df[col].notna().to_numpy()
+        if len(dropped):
+            values, _ = normalize_numeric(raw.loc[dropped, col], unit_scale=1e3 if "_kUSD" in col else 1.0)
+            read[dropped] = values.notna().to_numpy()
+        lost = pd.to_numeric(raw[col], errors="coerce").isna().to_numpy() & read
+        rescued[col] = np.bincount(batch[lost], minlength=n_jobs)
+
+    return [[w.strip() for w in clean_notices(int(invalid[i]), {col: int(n[i]) for col, n in rescued.items() if n[i]})]
+            for i in range(n_jobs)]
+
+
+def score_batch(jobs, config: dict):
+    """Clean and score the frames of several requests with one clean_rows() and one evaluate() call.
+
+    `jobs` is a list of (frame, operation, response format); each gets back either
+    (content type, body, headers) or the exception that request alone would have raised.
+    Every company is keyed by its request, so rows of different requests never meet.
+    """
+    try:
+        return _score_together(jobs, config)
+    except Exception:
+        if len(jobs) == 1:
+            raise
+        # One bad request must not fail the requests it was batched with
+        logger.warning("Batch of %d requests failed; scoring them one by one", len(jobs), exc_info=True)
+    return [_score_alone(job, config) for job in jobs]
+
+
+def _score_alone(job, config: dict):
+    try:
+        return _score_together([job], config)[0]
+    except Exception as e:
+        return e
+
+
+def _score_together(jobs, config: dict):
+    results = [None] * len(jobs)
+    parts, own_cols = [], {}
+    offset = 0
+    for i, (raw, _, _) in enumerate(jobs):
+        missing_cols = [c for c in SCORING_RULES if c not in raw.columns]
+        if missing_cols:
+            results[i] = ValueError(f"Missing required columns: {', '.join(missing_cols)}")
+            continue
+        own_cols[i] = list(raw.columns)
+
+        if COMPANY_COL in raw.columns:
+            codes, uniques = pd.factorize(raw[COMPANY_COL], sort=True, use_na_sentinel=False)
+        else:
+            codes, uniques = np.zeros(len(raw), dtype=int), [None]
+        part = raw.rename(columns={COMPANY_COL: _COMPANY_KEY})
+        part[COMPANY_COL] = codes + offset
+        part[_BATCH_COL] = i
+        offset += len(uniques)
+        parts.append(part)
+
+    if not parts:
+        return results
+
+    raw = pd.concat(parts, ignore_index=True)
+    df, _, _ = clean_rows(raw)
+    notices = _batch_notices(raw, df, len(jobs))
+    scored = evaluate(order_rows(df), config["norm_weights"], config["age_threshold"], config["score_threshold"],
+                      config["milestone_config"], config["model"])
+
+    input_cols = set().union(*own_cols.values(), {COMPANY_COL, _COMPANY_KEY, _BATCH_COL})
+    added = [c for c in scored.columns if c not in input_cols]
+    by_request = scored.groupby(_BATCH_COL, sort=False).indices
+    for i in own_cols:
+        if i not in by_request:
+            results[i] = ValueError("No rows to score.")
+            continue
+        df_i = scored.iloc[by_request[i]]
+        if COMPANY_COL in own_cols[i]:
+            df_i = df_i.assign(**{COMPANY_COL: df_i[_COMPANY_KEY].infer_objects()})
+        try:
+            results[i] = _respond(jobs[i][1], df_i[own_cols[i] + added].reset_index(drop=True), notices[i], jobs[i][2])
+        except Exception as e:
+            results[i] = e
+    return results
+
+
+@lru_cache(maxsize=64)
+def _parse_config(settings_json: str):
+    config = run_config(json.loads(settings_json))
+    fingerprint = scoring_fingerprint(config["norm_weights"], config["age_threshold"], config["score_threshold"],
+                                      config["milestone_config"], config["model"])
+    return config, fingerprint
+
+
+class MicroBatcher:
+    """Collects concurrent requests with the same scoring settings and scores them with one score_batch().
+
+    A batch is sent after BATCH_WINDOW_S or as soon as it holds BATCH_MAX_ROWS rows. Scoring runs on a
+    pool of `workers` processes, or on a thread with a single worker, so the event loop keeps serving.
+    """
+
+    def __init__(self, window: float = BATCH_WINDOW_S, max_rows: int = BATCH_MAX_ROWS, workers: int = None):
+        self.window = window
+        self.max_rows = max_rows
+        self.workers = pool_workers(workers)
+        self._pending = {}
+        self._running = set()
+
+    async def submit(self, frame: pd.DataFrame, operation: str, fmt: str, config: dict, fingerprint: str):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._pending.get(fingerprint)
+        if batch is None:
+            batch = self._pending[fingerprint] = {"config": config, "jobs": [], "futures": [], "rows": 0}
+            loop.call_later(self.window, self._flush, fingerprint, batch)
+        batch["jobs"].append((frame, operation, fmt))
+        batch["futures"].append(future)
+        batch["rows"] += len(frame)
+        if batch["rows"] >= self.max_rows:
+            self._flush(fingerprint, batch)
+
+        result = await future
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _flush(self, fingerprint: str, batch: dict):
+        # The timer of a batch that was already sent for being full finds a newer batch (or none) here
+        if self._pending.get(fingerprint) is not batch:
+            return
+        del self._pending[fingerprint]
+        task = asyncio.ensure_future(self._run(batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: dict):
+        executor = process_pool(self.workers) if self.workers > 1 else None
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                executor, score_batch, batch["jobs"], batch["config"])
+        except Exception as e:
+            logger.exception("Scoring batch of %d requests failed", len(batch["jobs"]))
+            results = [e] * len(batch["jobs"])
+        for future, result in zip(batch["futures"], results):
+            if not future.done():
+                future.set_result(result)
+
+    @property
+    def pending(self) -> int:
+        return sum(len(batch["jobs"]) for batch in self._pending.values())
+
+
+def _request_frame(headers: dict, body: bytes):
+    """(rows, request settings) from a JSON body {"rows": [...], "config": {...}} or an Arrow IPC stream
+    with the settings as JSON in the X-Scoring-Config header."""
+    content_type = headers.get("content-type", JSON).split(";")[0].strip().lower()
+    if content_type == ARROW_STREAM:
+        import pyarrow as pa
+
+        try:
+            table = pa.ipc.open_stream(body).read_all()
+            settings = json.loads(headers.get("x-scoring-config") or "{}")
+        except (pa.ArrowInvalid, json.JSONDecodeError) as e:
+            raise ValueError(f"Could not read the Arrow request: {e}")
+        nested = [field.name for field in table.schema if pa.types.is_nested(field.type)]
+        if nested:
+            raise ValueError(f"Columns must hold single values, not lists or structs: {', '.join(nested)}")
+        frame = table.to_pandas()
+    elif content_type == JSON:
+        try:
+            payload = json.loads(body or b"{}")
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Request body is not valid JSON: {e}")
+        if not isinstance(payload, dict) or not isinstance(payload.get("rows"), list):
+            raise ValueError('Expected a JSON object with a "rows" list of records.')
+        if not all(isinstance(row, dict) for row in payload["rows"]):
+            raise ValueError('Every entry of "rows" must be an object of column values.')
+        frame = pd.DataFrame.from_records(payload["rows"])
+        settings = payload.get("config") or {}
+    else:
+        raise ValueError(f"Unsupported content type '{content_type}'; send {JSON} or {ARROW_STREAM}.")
+
+    if not isinstance(settings, dict):
+        raise ValueError("Scoring config must be a JSON object.")
+    nested = [col for col in frame.columns if frame[col].dtype == object
+              and frame[col].map(lambda v: isinstance(v, (list, dict))).any()]
+    if nested:
+        raise ValueError(f"Columns must hold single values, not lists or objects: {', '.join(map(str, nested))}")
+    return frame, settings
+
+
+class ScoringService:
+    """evaluate / detect_risks / generate_score_table over HTTP, as /evaluate, /risks and /score-table.
+
+    Request settings (profile, weights, thresholds, milestone; see run_config()) override the server's
+    `defaults`. Responses are JSON unless the client accepts an Arrow IPC stream.
+    """
+
+    def __init__(self, defaults: dict = None, batcher: MicroBatcher = None):
+        if defaults is not None and not isinstance(defaults, dict):
+            raise ValueError("Default scoring config must be a mapping of settings.")
+        self.defaults = defaults or {}
+        self.batcher = batcher or MicroBatcher()
+        # Fails at startup rather than on the first request
+        _parse_config(json.dumps(self.defaults, sort_keys=True))
+
+    async def dispatch(self, method: str, path: str, headers: dict, body: bytes):
+        """(status, content type, body, extra headers) for one request."""
+        path = urlsplit(path).path.rstrip("/") or "/"
+        if path == "/health":
+            if method not in ("GET", "HEAD"):
+                raise HTTPError(405, "Use GET.")
+            return 200, JSON, json.dumps({"status": "ok", "queued": self.batcher.pending}).encode(), {}
+
+        operation = path.lstrip("/")
+        if operation not in OPERATIONS:
+            raise HTTPError(404, f"Unknown endpoint {path}; expected /health or one of "
+                                 f"{', '.join('/' + op for op in OPERATIONS)}.")
+        if method != "POST":
+            raise HTTPError(405, "Use POST.")
+
+        frame, settings = _request_frame(headers, body)
+        config, fingerprint = _parse_config(json.dumps({**self.defaults, **settings}, sort_keys=True))
+        fmt = ARROW_STREAM if ARROW_STREAM in headers.get("accept", "") else JSON
+        content_type, payload, extra = await self.batcher.submit(frame, operation, fmt, config, fingerprint)
+        return 200, content_type, payload, extra
+
+
+async def _read_request(reader: asyncio.StreamReader):
+    """(method, target, version, headers, body), or None when the client closed the connection."""
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "Malformed request line.")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        if len(headers) >= MAX_HEADERS:
+            raise HTTPError(400, "Too many headers.")
+        name, sep, value = line.decode("latin-1").partition(":")
+        if not sep:
+            raise HTTPError(400, "Malformed header line.")
+        headers[name.strip().lower()] = value.strip()
+
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise HTTPError(411, "Chunked bodies are not supported; send Content-Length.")
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPError(400, "Invalid Content-Length.")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, f"Request body is larger than {MAX_BODY_BYTES // (1024 * 1024)} MB.")
+    body = await reader.readexactly(length) if length > 0 else b""
+    return method.upper(), target, version.upper(), headers, body
+
+
+def _response(status: int, content_type: str, body: bytes, keep_alive: bool, extra: dict = None,
+              head: bool = False) -> bytes:
+    lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}", f"Content-Type: {content_type}",
+             f"Content-Length: {len(body)}", f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    lines += [f"{name}: {value}" for name, value in (extra or {}).items()]
+    # HEAD gets the headers GET would send, Content-Length included, without the body
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (b"" if head else body)
+
+
+def _error_body(message: str) -> bytes:
+    return json.dumps({"error": message}).encode()
+
+
+async def _handle_connection(service: ScoringService, reader, writer):
+    try:
+        while True:
+            try:
+                request = await _read_request(reader)
+            except HTTPError as e:
+                writer.write(_response(e.status, JSON, _error_body(str(e)), keep_alive=False))
+                break
+            if request is None:
+                break
+
+            method, target, version, headers, body = request
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+            try:
+                status, content_type, payload, extra = await service.dispatch(method, target, headers, body)
+            except HTTPError as e:
+                status, content_type, payload, extra = e.status, JSON, _error_body(str(e)), {}
+            except ValueError as e:
+                status, content_type, payload, extra = 400, JSON, _error_body(str(e)), {}
+            except Exception as e:
+                logger.exception("%s %s failed", method, target)
+                status, content_type, payload, extra = 500, JSON, _error_body(f"{type(e).__name__}: {e}"), {}
+
+            writer.write(_response(status, content_type, payload, keep_alive, extra, head=method == "HEAD"))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(service: ScoringService, host: str = "127.0.0.1", port: int = 8765):
+    """Serve until cancelled."""
+    server = await asyncio.start_server(lambda r, w: _handle_connection(service, r, w), host, port)
+    logger.info("Scoring service listening on %s", ", ".join(str(s.getsockname()) for s in server.sockets))
+    async with server:
+        await server.serve_forever()
@@ -0,0 +1,129 @@
+# services/sensitivity.py
+
+from itertools import combinations
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from services.evaluation import score_matrix
+
+# Upper bound for one (rows x weight vectors) composite block; the sweep walks the vectors in chunks
+SWEEP_BLOCK_BYTES = 256 * 1024 ** 2
+
+
+def simplex_grid(n_metrics: int, steps: int = 4) -> np.ndarray:
+    """Every weight vector whose entries are multiples of 1/steps and sum to 1."""
+    bars = np.array(list(combinations(range(steps + n_metrics - 1), n_metrics - 1)), dtype=int)
+    bars = bars.reshape(-1, n_metrics - 1)
+    edges = np.hstack([np.full((len(bars), 1), -1), bars, np.full((len(bars), 1), steps + n_metrics - 1)])
+    return (np.diff(edges, axis=1) - 1) / steps
+
+
+def dirichlet_weights(n_metrics: int, n: int, base: np.ndarray = None, concentration: float = 50.0,
+                      seed: int = None) -> np.ndarray:
+    """Random weight vectors; centred on `base` when given (higher concentration = tighter), else uniform."""
+    rng = np.random.default_rng(seed)
+    if base is None:
+        alpha = np.ones(n_metrics)
+    else:
+        base = np.asarray(base, dtype=float)
+        alpha = concentration * base / base.sum() + 1e-3
+    return rng.dirichlet(alpha, size=n)
+
+
+def preset_weights(metrics: List[str], presets: Dict[str, Dict[str, float]]) -> np.ndarray:
+    return np.array([[p.get(m, 0.0) for m in metrics] for p in presets.values()], dtype=float)
+
+
+def weight_sweep(df_scored: pd.DataFrame, weight_matrix: np.ndarray, metrics: List[str],
+                 score_threshold=60, model=None) -> pd.DataFrame:
+    """Score every row under every weight vector (one row of `weight_matrix` per vector).
+
+    Returns per-row spread of CompositeScore across the vectors and QuadrantStability, the share of
+    vectors that leave the row in the quadrant it has in `df_scored`. Maturity does not depend on the
+    weights, so a row keeps its quadrant exactly when it stays on the same side of `score_threshold`
+    (or stays Incomplete).
+    """
+    W = np.asarray(weight_matrix, dtype=np.float64)
+    W = W[W.sum(axis=1) > 0]
+    if W.size == 0:
+        raise ValueError("No weight vector with a positive total")
+    W = (W / W.sum(axis=1, keepdims=True)).astype(np.float32)
+    n_vec = len(W)
+
+    scores = score_matrix(df_scored, metrics, model)
+    valid = ~np.isnan(scores)
+    complete = valid.all(axis=1)
+    filled = np.where(valid, scores, 0.0).astype(np.float32)
+
+    base = df_scored["CompositeScore"].to_numpy(dtype=float)
+    base_code = np.where(np.isnan(base), 0, np.where(base >= score_threshold, 1, 2))
+
+    n = len(df_scored)
+    mean = np.full(n, np.nan)
+    std = np.full(n, np.nan)
+    lo = np.full(n, np.inf, dtype=np.float32)
+    hi = np.full(n, -np.inf, dtype=np.float32)
+    n_high = np.zeros(n, dtype=np.int64)
+    n_valid = np.full(n, n_vec, dtype=np.int64)
+    n_same = np.zeros(n, dtype=np.int64)
+
+    # Complete rows: the composite is linear in the (normalised) weights, so its mean and variance
+    # across vectors come straight from the first two moments of W.
+    F = filled[complete].astype(np.float64)
+    W64 = W.astype(np.float64)
+    mean[complete] = F @ W64.mean(axis=0)
+    second = np.einsum("ij,jk,ik->i", F, W64.T @ W64 / n_vec, F)
+    std[complete] = np.sqrt(np.maximum(second - mean[complete] ** 2, 0.0))
+
+    partial = np.flatnonzero(~complete)
+    P, Pv = filled[partial].astype(np.float64), valid[partial].astype(np.float64)
+    p_sum = np.zeros(len(partial))
+    p_sq = np.zeros(len(partial))
+    p_valid = np.zeros(len(partial), dtype=np.int64)
+    p_same = np.zeros(len(partial), dtype=np.int64)
+
+    chunk = max(1, int(SWEEP_BLOCK_BYTES // (4 * max(n, 1))))
+    for start in range(0, n_vec, chunk):
+        Wc = W[start:start + chunk].T
+
+        block = filled @ Wc
+        with np.errstate(invalid="ignore", divide="ignore"):
+            if len(partial):
+                den = Pv @ W64[start:start + chunk].T
+                pb = np.where(den > 0, (P @ W64[start:start + chunk].T) / den, np.nan)
+                block[partial] = pb
+                ok = ~np.isnan(pb)
+                p_valid += ok.sum(axis=1)
+                pz = np.where(ok, pb, 0.0)
+                p_sum += pz.sum(axis=1)
+                p_sq += np.einsum("ij,ij->i", pz, pz)
+                code = np.where(ok, np.where(pb >= score_threshold, 1, 2), 0)
+                p_same += (code == base_code[partial, None]).sum(axis=1)
+
+            np.fmin(lo, np.fmin.reduce(block, axis=1), out=lo)
+            np.fmax(hi, np.fmax.reduce(block, axis=1), out=hi)
+            n_high += np.count_nonzero(block >= score_threshold, axis=1)
+
+    if len(partial):
+        n_valid[partial] = p_valid
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean[partial] = np.where(p_valid > 0, p_sum / p_valid, np.nan)
+            std[partial] = np.sqrt(np.maximum(p_sq / p_valid - mean[partial] ** 2, 0.0))
+        n_same[partial] = p_same
+
+    # Complete rows always have a composite, so only the side of the threshold can change
+    n_same[complete] = np.where(base_code[complete] == 1, n_high[complete], n_vec - n_high[complete])
+
+    lo = np.where(np.isinf(lo), np.nan, lo)
+    hi = np.where(np.isinf(hi), np.nan, hi)
+    return pd.DataFrame({
+        "CompositeMean": mean,
+        "CompositeStd": std,
+        "CompositeMin": lo,
+        "CompositeMax": hi,
+        "ShareAboveThreshold": n_high / n_vec,
+        "ShareIncomplete": 1 - n_valid / n_vec,
+        "QuadrantStability": n_same / n_vec,
+    }, index=df_scored.index)
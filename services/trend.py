@@ -1,37 +1,58 @@
 # services/trend.py
-'''
-def build_trend_segments(df_scored):
-    seg_dict = {t: {"x": [], "y": []} for t in ["up", "flat", "down"]}
-    for i in range(len(df_scored) - 1):
-        t = df_scored.iloc[i + 1]["Trend"]
-        seg_dict[t]["x"] += [df_scored.iloc[i]["Month"], df_scored.iloc[i + 1]["Month"], None]
-        seg_dict[t]["y"] += [df_scored.iloc[i]["CompositeScore"], df_scored.iloc[i + 1]["CompositeScore"], None]
-    return seg_dict
 
-'''
-
-
-def build_trend_segments(df_scored):
-    if "Month_Index" in df_scored.columns:
-        df_sorted = df_scored.sort_values("Month_Index").reset_index(drop=True)
-        x_col = "Month_Index"
-    else:
-        df_sorted = df_scored.sort_values("Month").reset_index(drop=True)
-        x_col = "Month"
-
-    seg_dict = {t: {"x": [], "y": []} for t in ["up", "flat", "down"]}
-
-    for i in range(len(df_sorted) - 1):
-        trend = df_sorted.iloc[i + 1]["Trend"]
-        seg_dict[trend]["x"] += [
-            df_sorted.iloc[i][x_col],
-            df_sorted.iloc[i + 1][x_col],
-            None
-        ]
-        seg_dict[trend]["y"] += [
-            df_sorted.iloc[i]["CompositeScore"],
-            df_sorted.iloc[i + 1]["CompositeScore"],
-            None
-        ]
-
-    return seg_dict
\ No newline at end of file
+import numpy as np
+import pandas as pd
+
+from constant import COMPANY_COL
+
+TRENDS = ("up", "flat", "down")
+
+
+def _runs(steps: np.ndarray):
+    """Maximal runs of consecutive step numbers as (first point, last point) pairs."""
+    breaks = np.flatnonzero(np.diff(steps) > 1)
+    starts = steps[np.r_[0, breaks + 1]]
+    ends = steps[np.r_[breaks, len(steps) - 1]] + 1
+    return starts, ends
+
+
+def build_trend_segments(df_scored: pd.DataFrame, x_col: str = None):
+    """Per-trend line coordinates for the velocity map: {trend: {"x": array, "y": array}}.
+
+    Rows are ordered by company (if present) and x; the step into each row takes that row's Trend.
+    Consecutive steps with the same trend form one polyline and polylines are separated by NaN, so
+    each trend is a single trace. Steps never join two companies.
+    """
+    if x_col is None:
+        x_col = "Month_Index" if "Month_Index" in df_scored.columns else "Month"
+    keys = [COMPANY_COL, x_col] if COMPANY_COL in df_scored.columns else [x_col]
+    df_sorted = df_scored.sort_values(keys, kind="stable")
+
+    x = df_sorted[x_col].to_numpy(dtype=float)
+    y = df_sorted["CompositeScore"].to_numpy(dtype=float)
+    step_trend = df_sorted["Trend"].to_numpy()[1:]
+    joined = np.ones(len(step_trend), dtype=bool)
+    if COMPANY_COL in df_sorted.columns:
+        company = df_sorted[COMPANY_COL].to_numpy()
+        joined = company[1:] == company[:-1]
+
+    seg_dict = {}
+    for trend in TRENDS:
+        steps = np.flatnonzero(joined & (step_trend == trend))
+        if not len(steps):
+            seg_dict[trend] = {"x": np.empty(0), "y": np.empty(0)}
+            continue
+
+        starts, ends = _runs(steps)
+        lengths = ends - starts + 1
+        offsets = np.cumsum(lengths) - lengths
+        points = np.arange(lengths.sum()) - np.repeat(offsets, lengths) + np.repeat(starts, lengths)
+        # Each run is followed by one NaN gap
+        slots = np.arange(len(points)) + np.repeat(np.arange(len(lengths)), lengths)
+
+        xs = np.full(len(points) + len(lengths), np.nan)
+        ys = xs.copy()
+        xs[slots] = x[points]
+        ys[slots] = y[points]
+        seg_dict[trend] = {"x": xs, "y": ys}
+    return seg_dict
@@ -0,0 +1,96 @@
+# services/uncertainty.py
+
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from constant import QUADRANT_LABELS
+from services.evaluation import company_groups
+from services.scoring_model import ScoringModel, load_profile
+
+# Rows per batch: the (rows x draws x metrics) float32 block for 2k rows x 500 draws x 9 metrics is ~36 MB
+BOOTSTRAP_CHUNK_ROWS = 2000
+
+
+def metric_noise(df: pd.DataFrame, metrics) -> np.ndarray:
+    """Per-row noise scale for each metric: month-to-month jitter of that company's series.
+
+    For a series that is level + independent noise, std(diff) = sqrt(2) * noise std. Companies with
+    too short a history fall back to the metric's jitter across the whole frame.
+    """
+    groups = company_groups(df)
+    raw = df[metrics].apply(pd.to_numeric, errors="coerce")
+    diffs = raw.groupby(groups, sort=False, dropna=False).diff()
+    per_company = diffs.groupby(groups, sort=False, dropna=False).transform("std") / np.sqrt(2)
+    overall = diffs.std() / np.sqrt(2)
+    return per_company.fillna(overall).fillna(0.0).to_numpy(dtype=np.float32)
+
+
+def bootstrap_scores(df_scored: pd.DataFrame, weights: Dict[str, float], score_threshold=60, n_boot=500,
+                     level=0.9, seed=0, model: ScoringModel = None) -> pd.DataFrame:
+    """Perturb each row's metrics `n_boot` times and re-score; returns CI bands and P(quadrant) per row.
+
+    Rows are processed in batches, each with its own seeded RNG stream; the rows of a batch share
+    the batch's standard-normal draws (scaled by their own noise), which leaves every row's
+    distribution exact while drawing only n_boot x metrics numbers per batch.
+
+    Maturity does not depend on the metric noise, so each row can only land in the two quadrants of
+    its stage (or stay Incomplete when it has no scoreable metric).
+    """
+    model = model or load_profile()
+    metrics = [m for m in weights if m in df_scored.columns]
+    w = np.array([weights[m] for m in metrics], dtype=float)
+    good, bad, hib, denom = model.arrays(metrics)
+
+    raw = df_scored[metrics].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    valid = ~np.isnan(raw) & ~np.isnan(denom)
+    w_sum = valid @ w
+    scoreable = w_sum > 0
+
+    # Normalized score before clipping is linear in the value: (value - bad) * sign / denom
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scale = np.nan_to_num(np.where(hib, 1.0, -1.0) / denom)
+        coef = np.where(valid, 100.0 * w, 0.0) / np.where(scoreable, w_sum, 1.0)[:, None]
+    center = np.nan_to_num((raw - np.nan_to_num(bad)) * scale).astype(np.float32)
+    spread = (metric_noise(df_scored, metrics) * scale).astype(np.float32)
+    coef = coef.astype(np.float32)[:, :, None]
+
+    n = len(df_scored)
+    lo_k = int(np.floor((1 - level) / 2 * (n_boot - 1)))
+    hi_k = int(np.ceil((1 + level) / 2 * (n_boot - 1)))
+    low = np.full(n, np.nan)
+    high = np.full(n, np.nan)
+    std = np.full(n, np.nan)
+    p_high = np.full(n, np.nan)
+
+    starts = range(0, n, BOOTSTRAP_CHUNK_ROWS)
+    streams = np.random.SeedSequence(seed).spawn(len(starts))
+    for start, stream in zip(starts, streams):
+        rows = slice(start, start + BOOTSTRAP_CHUNK_ROWS)
+        z = np.random.default_rng(stream).standard_normal((n_boot, len(metrics)), dtype=np.float32)
+
+        draws = spread[rows, None, :] * z
+        draws += center[rows, None, :]
+        np.clip(draws, 0.0, 1.0, out=draws)
+        composite = np.matmul(draws, coef[rows])[:, :, 0]
+
+        part = np.partition(composite, [lo_k, hi_k], axis=1)
+        low[rows] = part[:, lo_k]
+        high[rows] = part[:, hi_k]
+        std[rows] = composite.std(axis=1)
+        p_high[rows] = (composite >= score_threshold).mean(axis=1)
+
+    p_high = np.where(scoreable, p_high, 0.0)
+    mature = df_scored["_is_mature"].to_numpy(dtype=bool)
+    zero = np.zeros(n)
+    return pd.DataFrame({
+        "CompositeLow": np.where(scoreable, low, np.nan),
+        "CompositeHigh": np.where(scoreable, high, np.nan),
+        "CompositeStd": np.where(scoreable, std, np.nan),
+        f"P_{QUADRANT_LABELS['q1']}": np.where(mature, p_high, zero),
+        f"P_{QUADRANT_LABELS['q2']}": np.where(~mature, p_high, zero),
+        f"P_{QUADRANT_LABELS['q3']}": np.where(~mature & scoreable, 1 - p_high, zero),
+        f"P_{QUADRANT_LABELS['q4']}": np.where(mature & scoreable, 1 - p_high, zero),
+        f"P_{QUADRANT_LABELS['q0']}": np.where(scoreable, zero, 1.0),
+    }, index=df_scored.index)
@@ -1,12 +1,13 @@
-import base64
 import pandas as pd
-import streamlit as st
-from constant import SCORING_RULES
-from pathlib import Path
+from constant import COMPANY_COL, SCORING_RULES
+from services.normalize import normalize_numeric
 
 import re
+import warnings
 from typing import Union
 
+import numpy as np
+
 
 def _parse_month_to_yyyymm(value, base_year=2024, base_month=1) -> Union[int, type(pd.NA)]:
     if pd.isna(value):
@@ -62,6 +63,85 @@ def _parse_month_to_yyyymm(value, base_year=2024, base_month=1) -> Union[int, ty
     return pd.NA
 
 
+def _int_months(n: np.ndarray, base_year=2024, base_month=1) -> np.ndarray:
+    """Integer rules of _parse_month_to_yyyymm, vectorized; NaN where no rule applies."""
+    out = np.full(len(n), np.nan)
+
+    m8 = (n // 100) % 100
+    ymd = (n >= 19000101) & (n <= 21001231)
+    out[ymd] = np.where((m8[ymd] >= 1) & (m8[ymd] <= 12), (n[ymd] // 10000) * 100 + m8[ymd], -1)
+
+    m6 = n % 100
+    ym = (n >= 190001) & (n <= 210012)
+    out[ym] = np.where((m6[ym] >= 1) & (m6[ym] <= 12), n[ym], -1)
+
+    year = (n >= 1900) & (n <= 2100)
+    out[year] = n[year] * 100 + base_month
+
+    month = (n >= 1) & (n <= 12)
+    out[month] = base_year * 100 + n[month]
+    return out
+
+
+def _parse_unique_months(values: pd.Index, base_year=2024, base_month=1) -> np.ndarray:
+    # -1 marks values known to be invalid, NaN values still to be parsed
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return (values.year * 100 + values.month).to_numpy(dtype=float)
+
+    out = np.full(len(values), np.nan)
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        # Whole-number floats (an integer column with blanks) count as integers
+        num = values.to_numpy(dtype=float)
+        integral = np.isfinite(num) & (num == np.floor(num))
+        out[integral] = _int_months(num[integral].astype(np.int64), base_year, base_month)
+        text = pd.Series(values.astype(str), dtype=object).where(~integral & np.isfinite(num))
+    else:
+        text = pd.Series(values, dtype=object).astype(str).str.strip()
+        digits = text.str.fullmatch(r"\d{1,8}").to_numpy(dtype=bool)
+        out[digits] = _int_months(text[digits].astype(np.int64).to_numpy(), base_year, base_month)
+
+        iso = text.str.extract(r"^(\d{4})-(\d{2})(?:-(\d{2}))?$")
+        is_iso = iso[0].notna().to_numpy() & np.isnan(out)
+        if is_iso.any():
+            iso = iso[is_iso]
+            y, m = iso[0].astype(int).to_numpy(), iso[1].astype(int).to_numpy()
+            valid = (m >= 1) & (m <= 12)
+            dated = iso[2].notna().to_numpy()
+            if dated.any():
+                days = pd.to_datetime(iso.loc[dated, 0] + "-" + iso.loc[dated, 1] + "-" + iso.loc[dated, 2],
+                                      format="%Y-%m-%d", errors="coerce")
+                valid[dated] &= days.notna().to_numpy()
+            out[np.flatnonzero(is_iso)[valid]] = (y * 100 + m)[valid]
+
+        text = text.where(np.isnan(out) & (text != ""))
+        out[(text.isna() & np.isnan(out)).to_numpy()] = -1
+
+    # Everything else: one pd.to_datetime call with a format inferred for the column
+    pending = np.isnan(out) & text.notna().to_numpy()
+    if pending.any():
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            dates = pd.to_datetime(text[pending], errors="coerce")
+        if pd.api.types.is_datetime64_any_dtype(dates):
+            parsed = dates.notna().to_numpy()
+            idx = np.flatnonzero(pending)
+            out[idx[parsed]] = (dates.dt.year * 100 + dates.dt.month)[parsed].to_numpy()
+
+    # Leftovers (mixed formats, "Q1 2024", out-of-range numbers, ...) take the scalar rules
+    for i in np.flatnonzero(np.isnan(out)):
+        result = _parse_month_to_yyyymm(values[i], base_year, base_month)
+        out[i] = -1 if pd.isna(result) else result
+    return out
+
+
+def parse_month_column(values: pd.Series, base_year=2024, base_month=1) -> pd.Series:
+    """_parse_month_to_yyyymm for a whole column: each distinct value is parsed once and mapped back."""
+    codes, uniques = pd.factorize(values)
+    parsed = np.append(_parse_unique_months(pd.Index(uniques), base_year, base_month), -1)
+    months = parsed[codes]
+    return pd.Series(pd.array(np.where(months > 0, months, np.nan), dtype="Int64"), index=values.index)
+
+
 def format_month_for_display(yyyymm: int) -> str:
     if pd.isna(yyyymm) or yyyymm == 0:
         return "Unknown"
@@ -72,58 +152,74 @@ def format_month_for_display(yyyymm: int) -> str:
     return f"{year}-{month:02d}"
 
 
-def clean_df(df_raw: pd.DataFrame) -> pd.DataFrame:
+def clean_rows(df_raw: pd.DataFrame):
+    """Row-local part of clean_frame, safe to run chunk by chunk; returns (df, invalid months, rescued cells)."""
     df = df_raw.copy()
 
     missing_cols = [c for c in SCORING_RULES if c not in df.columns]
     if missing_cols:
-        st.error(f"Missing required columns: {', '.join(missing_cols)}")
-        st.stop()
+        raise ValueError(f"Missing required columns: {', '.join(missing_cols)}")
 
     metric_cols = [col for col in SCORING_RULES if col != "Month"]
+    rescued = {}
     for col in metric_cols:
-        df[col] = pd.to_numeric(df[col], errors="coerce")
-        df[col] = df[col].clip(lower=-1e6, upper=1e6)
+        # "$45k" in a kUSD column is 45
+        values, rescued[col] = normalize_numeric(df[col], unit_scale=1e3 if "_kUSD" in col else 1.0)
+        df[col] = values.clip(lower=-1e6, upper=1e6)
 
     df["__row_has_nan"] = df[metric_cols].isna().any(axis=1)
 
+    invalid_count = 0
     if "Month" in df.columns:
-        df["Month"] = df["Month"].apply(_parse_month_to_yyyymm)
+        df["Month"] = parse_month_column(df["Month"])
 
-        invalid_count = df["Month"].isna().sum()
+        invalid_count = int(df["Month"].isna().sum())
         if invalid_count > 0:
-            st.info(f" {invalid_count} rows with invalid Month format were dropped.")
             df = df.dropna(subset=["Month"])
-
         if len(df) > 0:
             df["Month"] = df["Month"].astype(int)
 
-            df["Month_Display"] = df["Month"].apply(format_month_for_display)
+    return df, invalid_count, {col: n for col, n in rescued.items() if n}
 
-            df = df.sort_values("Month").reset_index(drop=True)
-            df["Month_Index"] = range(len(df))
 
-    return df
+def order_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Whole-frame part of clean_frame: Month_Display, (company, month) order and Month_Index."""
+    if "Month" not in df.columns or len(df) == 0:
+        return df
 
-def get_img_as_base64(file_path):
-    return base64.b64encode(Path(file_path).read_bytes()).decode()
+    months = df["Month"].unique()
+    df["Month_Display"] = df["Month"].map(dict(zip(months, map(format_month_for_display, months))))
 
+    if COMPANY_COL in df.columns:
+        df = df.sort_values([COMPANY_COL, "Month"], kind="stable").reset_index(drop=True)
+        df["Month_Index"] = df.groupby(COMPANY_COL, sort=False, dropna=False).cumcount()
+    else:
+        df = df.sort_values("Month").reset_index(drop=True)
+        df["Month_Index"] = range(len(df))
+    return df
 
-def render_brand_logo(where="sidebar", width=200):
-    logo_path = "resources/logo.png"
 
-    target = st.sidebar if where == "sidebar" else st
+def filter_months(df: pd.DataFrame, month_range=None) -> pd.DataFrame:
+    """Rows whose Month (YYYYMM) lies in the inclusive range, in (company, month) order."""
+    if not month_range:
+        return df
+    sm, em = month_range
+    mask = pd.to_numeric(df["Month"], errors="coerce").between(sm, em, inclusive="both")
+    sort_cols = [COMPANY_COL, "Month"] if COMPANY_COL in df.columns else ["Month"]
+    return df.loc[mask].sort_values(sort_cols, kind="stable").reset_index(drop=True)
 
-    target.image(logo_path, width=width)
 
+def clean_notices(invalid_count: int, rescued: dict) -> list:
+    notices = []
+    if rescued:
+        notices.append(" Converted formatted numbers (currency, %, separators, suffixes): " +
+                       ", ".join(f"{col} {n}" for col, n in rescued.items()))
+    if invalid_count > 0:
+        notices.append(f" {invalid_count} rows with invalid Month format were dropped.")
+    return notices
 
 
-def render_logo_with_title(title):
-    logo_path = "resources/logo.png"
-    logo_base64 = get_img_as_base64(logo_path)
-    return f"""
-    <div style='display: flex; align-items: center; gap: 16px;'>
-        <img src='data:image/png;base64,{logo_base64}' style='width:80px; height:auto;'>
-        <h2 style='margin:0; font-size:2rem;'>{title}</h2>
-    </div>
-    """
+def clean_frame(df_raw: pd.DataFrame):
+    """Clean a raw frame; returns (df, notices) and raises ValueError on missing columns."""
+    df, invalid_count, rescued = clean_rows(df_raw)
+    return order_rows(df), clean_notices(invalid_count, rescued)
@@ -0,0 +1,42 @@
+# services/workers.py
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+_pools = {}
+_pool_lock = threading.Lock()
+
+
+def process_pool(workers: int = None) -> ProcessPoolExecutor:
+    """Process pool with `workers` processes (default: one per CPU), created on first use and reused.
+
+    Jobs asking for the same number of workers share one pool, so a job never runs more tasks at once
+    than it asked for. Workers are spawned rather than forked, so they never inherit the server's threads
+    or locks. A pool broken by a worker that died (out of memory, a crash in a native library) is replaced.
+    """
+    size = workers or os.cpu_count() or 1
+    with _pool_lock:
+        pool = _pools.get(size)
+        if pool is not None and getattr(pool, "_broken", False):
+            pool.shutdown(wait=False, cancel_futures=True)
+            pool = None
+        if pool is None:
+            pool = _pools[size] = ProcessPoolExecutor(max_workers=size,
+                                                      mp_context=multiprocessing.get_context("spawn"))
+        return pool
+
+
+def pool_workers(requested: int = None) -> int:
+    """Worker count for a parallel job; 1 inside a pool worker, so jobs never start nested pools."""
+    if multiprocessing.parent_process() is not None:
+        return 1
+    return requested or os.cpu_count() or 1
+
+
+def split_evenly(n_items: int, n_parts: int):
+    """Contiguous (start, stop) ranges covering n_items in at most n_parts non-empty pieces."""
+    n_parts = max(1, min(n_parts, n_items))
+    bounds = [n_items * i // n_parts for i in range(n_parts + 1)]
+    return [(start, stop) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
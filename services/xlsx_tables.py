@@ -0,0 +1,81 @@
+# services/xlsx_tables.py
+
+import io
+from typing import List, Tuple
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from constant import COMPANY_COL, SCORING_RULES
+from services.workers import pool_workers, process_pool, split_evenly
+
+# Fewer sheets than this are read in-process; each worker has to load the workbook's shared strings again
+XLSX_PARALLEL_MIN_SHEETS = 4
+
+
+def _open(data: bytes):
+    # read_only streams the sheet XML without building cells or styles; data_only reads cached formula results
+    return load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+
+
+def _sheet_frame(ws) -> pd.DataFrame:
+    """First row as header, stopping at the last non-empty row and column."""
+    rows = list(ws.iter_rows(values_only=True))
+    while rows and all(cell is None for cell in rows[-1]):
+        rows.pop()
+    if not rows:
+        return pd.DataFrame()
+
+    width = max((i + 1 for row in rows for i, cell in enumerate(row) if cell is not None), default=0)
+    header = [f"Unnamed: {i}" if h is None else str(h).strip() for i, h in enumerate(rows[0][:width])]
+    header += [f"Unnamed: {i}" for i in range(len(header), width)]
+    body = [row[:width] + (None,) * (width - len(row)) for row in rows[1:]]
+    return pd.DataFrame(body, columns=header)
+
+
+def _read_sheets(data: bytes, names: List[str]) -> List[Tuple[str, pd.DataFrame]]:
+    wb = _open(data)
+    try:
+        return [(name, _sheet_frame(wb[name])) for name in names]
+    finally:
+        wb.close()
+
+
+def read_xlsx_sheets(data: bytes, workers: int = None) -> List[Tuple[str, pd.DataFrame]]:
+    """(sheet name, frame) for every worksheet, in workbook order; many sheets are split across processes."""
+    wb = _open(data)
+    try:
+        names = list(wb.sheetnames)
+        pool_size = pool_workers(workers)
+        workers = min(pool_size, len(names))
+        if len(names) < XLSX_PARALLEL_MIN_SHEETS or workers < 2:
+            return [(name, _sheet_frame(wb[name])) for name in names]
+    finally:
+        wb.close()
+
+    futures = [process_pool(pool_size).submit(_read_sheets, data, names[start:stop])
+               for start, stop in split_evenly(len(names), workers)]
+    return [sheet for future in futures for sheet in future.result()]
+
+
+def read_xlsx(data: bytes, workers: int = None) -> pd.DataFrame:
+    """Workbook as one frame: each sheet with the scoring columns is one company, named after the sheet.
+
+    A single matching sheet is returned as-is, and a sheet that already has a company column keeps it.
+    Workbooks without any matching sheet fall back to the first sheet, like pd.read_excel.
+    """
+    sheets = read_xlsx_sheets(data, workers)
+    if not sheets:
+        return pd.DataFrame()
+    matching = [(name, df) for name, df in sheets if all(col in df.columns for col in SCORING_RULES)]
+    if not matching:
+        return sheets[0][1]
+    if len(matching) == 1:
+        return matching[0][1]
+
+    frames = []
+    for name, df in matching:
+        if COMPANY_COL not in df.columns:
+            df.insert(0, COMPANY_COL, name)
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)